@@ -0,0 +1,62 @@
+"""Time load_ortsteile (polygon construction and station assignment) with 1 to n worker
+processes on synthetic stations spread over Berlin, e.g.
+
+    python -m benchmarks.districts --stations 20000 --max-workers 8
+"""
+import os
+import random
+import time
+from argparse import ArgumentParser
+
+from berlin_public_transport_reachability.entities import DEFAULT_PRODUCTS
+from berlin_public_transport_reachability.fetch import load_ortsteile
+from berlin_public_transport_reachability.providers import PROVIDERS
+from berlin_public_transport_reachability.station import Station
+
+# Berlin bounding box
+LATITUDES = (52.34, 52.68)
+LONGITUDES = (13.09, 13.76)
+
+
+def make_stations(count: int, seed: int = 0) -> list[Station]:
+    rnd = random.Random(seed)
+    stations = []
+    for i in range(count):
+        station = Station(
+            name=f"Stop {i}",
+            coordinates=(rnd.uniform(*LATITUDES), rnd.uniform(*LONGITUDES)),
+            products=DEFAULT_PRODUCTS,
+        )
+        station.add_duration("Destination", rnd.randint(1, 60))
+        stations.append(station)
+    return stations
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, default=20000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--repeat", help="Runs per worker count (best is shown)", type=int, default=3
+    )
+    args = parser.parse_args()
+
+    path = PROVIDERS["bvg"].regions_path
+    if path is None:
+        raise ValueError("No district polygons available.")
+    stations = make_stations(args.stations)
+    baseline = None
+    print(f"{args.stations} stations, best of {args.repeat} runs")
+    for workers in range(1, args.max_workers + 1):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            load_ortsteile(path=path, stations=stations, workers=workers)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        baseline = baseline or best
+        print(f"workers={workers}: {best:.3f} s (speedup {baseline / best:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
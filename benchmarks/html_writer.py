@@ -0,0 +1,112 @@
+"""Time and peak memory of drawing synthetic stations with the folium based ReachableMap vs the
+streaming html writer, e.g.
+
+    python -m benchmarks.html_writer --stations 2000 20000
+
+Both write index.html to a temporary directory; the browser is not opened.
+"""
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from collections.abc import Callable
+from pathlib import Path
+
+from benchmarks.districts import LATITUDES, LONGITUDES
+from berlin_public_transport_reachability.entities import (
+    DEFAULT_PRODUCTS,
+    Destination,
+    DestinationLocation,
+)
+from berlin_public_transport_reachability.html_writer import stream_reachable_stations
+from berlin_public_transport_reachability.map import ReachableMap
+from berlin_public_transport_reachability.settings import get_settings
+from berlin_public_transport_reachability.station import Station
+
+DESTINATIONS = [
+    Destination(
+        name=name,
+        location=DestinationLocation(latitude=latitude, longitude=longitude),
+        products=DEFAULT_PRODUCTS,
+    )
+    for name, latitude, longitude in [
+        ("Alexanderplatz", 52.521512, 13.411267),
+        ("Mehringdamm", 52.493567, 13.38814),
+        ("Nollendorfplatz", 52.499644, 13.353825),
+    ]
+]
+CIRCLE_RADIUS = 200
+
+
+def make_stations(count: int, seed: int = 0) -> list[Station]:
+    """Stations spread over Berlin, reaching each destination within max_duration"""
+    max_duration = get_settings().general.max_duration
+    rnd = random.Random(seed)
+    stations = []
+    for i in range(count):
+        station = Station(
+            name=f"Stop {i}",
+            coordinates=(rnd.uniform(*LATITUDES), rnd.uniform(*LONGITUDES)),
+            products=DEFAULT_PRODUCTS,
+        )
+        for destination in DESTINATIONS:
+            station.add_duration(destination.name, rnd.randint(1, max_duration))
+        stations.append(station)
+    return stations
+
+
+def draw_folium(stations: list[Station]) -> None:
+    ReachableMap(
+        destinations=DESTINATIONS, stations=stations, circle_radius=CIRCLE_RADIUS
+    ).draw_reachable_stations()
+
+
+def draw_streaming(stations: list[Station]) -> None:
+    stream_reachable_stations(
+        destinations=DESTINATIONS, stations=stations, circle_radius=CIRCLE_RADIUS
+    )
+
+
+def measure(
+    draw: Callable[[list[Station]], None], stations: list[Station]
+) -> tuple[float, int]:
+    """Return the duration in seconds and the peak of traced memory in bytes"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    draw(stations)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, nargs="+", default=[2000, 20000])
+    args = parser.parse_args()
+
+    os.environ["BROWSER"] = "true"  # a no-op command instead of a browser
+    cwd = Path.cwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for count in args.stations:
+                stations = make_stations(count)
+                for name, draw in [
+                    ("folium", draw_folium),
+                    ("streaming", draw_streaming),
+                ]:
+                    duration, peak = measure(draw, stations)
+                    size = Path("index.html").stat().st_size
+                    print(
+                        f"{count} stations, {name}: {duration:.2f} s, "
+                        f"{peak / 2**20:.1f} MB peak, {size / 2**20:.1f} MB html"
+                    )
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Time StationIndex queries against a full scan over synthetic stations with durations to many
+destinations, e.g.
+
+    python -m benchmarks.query --stations 20000 --destinations 50
+"""
+import random
+import time
+from argparse import ArgumentParser
+
+from benchmarks.districts import LATITUDES, LONGITUDES
+from berlin_public_transport_reachability.entities import DestinationProducts
+from berlin_public_transport_reachability.query import (
+    NOT_REACHED,
+    StationIndex,
+    StationQuery,
+)
+from berlin_public_transport_reachability.station import Station
+
+RAIL = DestinationProducts.from_bitmask(0b0000011)  # S, U
+
+
+def make_stations(count: int, destinations: int, seed: int = 0) -> list[Station]:
+    rnd = random.Random(seed)
+    stations = []
+    for i in range(count):
+        station = Station(
+            name=f"Stop {i}",
+            coordinates=(rnd.uniform(*LATITUDES), rnd.uniform(*LONGITUDES)),
+            products=DestinationProducts.from_bitmask(rnd.randrange(1, 128)),
+        )
+        for destination in range(destinations):
+            # some stations are not found for a destination
+            if rnd.random() < 0.01:
+                continue
+            station.add_duration(f"Destination {destination}", rnd.randint(1, 80))
+        station.fill_durations_not_found(
+            [f"Destination {d}" for d in range(destinations)], max_duration=80
+        )
+        stations.append(station)
+    return stations
+
+
+def scan(stations: list[Station], query: StationQuery) -> list[str]:
+    """Reference: filter and sort all stations one by one; durations to destinations a station
+    was not found for never match"""
+    required = query.products.as_bitmask() if query.products else 0
+    matches = []
+    for station in stations:
+        durations = {
+            d: NOT_REACHED if d in station.not_found else v
+            for d, v in station.durations.items()
+        }
+        worst = max(durations.values())
+        average = NOT_REACHED if station.not_found else station.get_weighted_duration()
+        if query.max_duration is not None and worst > query.max_duration:
+            continue
+        if any(durations[d] > m for d, m in query.max_durations.items()):
+            continue
+        if query.max_average is not None and average > query.max_average:
+            continue
+        if station.products.as_bitmask() & required != required:
+            continue
+        key = (
+            worst
+            if query.sort_by == "worst"
+            else average
+            if query.sort_by == "average"
+            else durations[query.sort_by]
+        )
+        matches.append((key, station.name))
+    matches.sort(key=lambda m: m[0])
+    return [name for _, name in matches[: query.limit]]
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, default=20000)
+    parser.add_argument("--destinations", type=int, default=50)
+    args = parser.parse_args()
+
+    stations = make_stations(args.stations, args.destinations)
+    start = time.perf_counter()
+    index = StationIndex(stations)
+    print(
+        f"{args.stations} stations x {args.destinations} destinations, "
+        f"index built in {time.perf_counter() - start:.2f} s"
+    )
+    queries = {
+        "worst <= 75": StationQuery(max_duration=75),
+        "one destination <= 10": StationQuery(max_durations={"Destination 0": 10}),
+        "two destinations <= 20, rail, top 10": StationQuery(
+            max_durations={"Destination 1": 20, "Destination 2": 20},
+            products=RAIL,
+            sort_by="Destination 1",
+            limit=10,
+        ),
+        "average <= 30, by average": StationQuery(max_average=30, sort_by="average"),
+    }
+    for name, query in queries.items():
+        start = time.perf_counter()
+        results = index.query(query)
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        expected = scan(stations, query)
+        scanned = time.perf_counter() - start
+        # ties may be ordered differently, and a limit may cut through them
+        names = [r.station.name for r in results]
+        if len(names) != len(expected) or (
+            query.limit is None and sorted(names) != sorted(expected)
+        ):
+            raise RuntimeError(f"{name}: results differ from the full scan")
+        print(
+            f"{name}: {len(results)} stations, index {indexed * 1000:.1f} ms, "
+            f"scan {scanned * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Response cache for the transport api: installation (incl. offline mode), inspection, pruning,
+concurrent warming and export of cached entries"""
+import datetime
+import functools
+import json
+import logging
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse
+
+import requests_cache
+from requests_cache.backends.base import BaseCache
+from requests_cache.cache_keys import create_key, normalize_request
+from requests_cache.models import AnyRequest
+from requests_cache.models.response import CachedResponse
+
+from berlin_public_transport_reachability.entities import QueryOptions
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.transport_api import get_time_slot
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = "test_cache"
+EXPIRE_AFTER = 2592000  # 30 days
+# request parameters holding a time slot as iso timestamp: reachable-from and journeys
+WHEN_PARAMETERS = ("when", "departure")
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    host: str
+    endpoint: str
+    destination: str | None  # address (reachable-from) or query (locations)
+    location: str | None  # name the query resolved to (locations)
+    when: str | None  # time slot as iso timestamp
+    created_at: datetime.datetime
+    expires: datetime.datetime | None
+    size: int  # in bytes
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires is not None and self.expires < datetime.datetime.now(
+            tz=datetime.UTC
+        )
+
+    @property
+    def time_slot(self) -> TimeValue | None:
+        return get_time_slot(self.when) if self.when else None
+
+    def matches(self, destinations: set[str] | None, time: TimeValue | None) -> bool:
+        """Whether the entry belongs to one of the destination names and the time slot (None
+        matches all)"""
+        return (destinations is None or self.destination in destinations) and (
+            time is None or self.time_slot == time
+        )
+
+
+def install_cache(*, offline: bool = False) -> None:
+    """Install the response cache for all requests. In offline mode, responses are served only
+    from the cache, expired ones included; misses are answered with a 504 (Not Cached) response
+    and no request is sent. As the time slots roll over to their next date, offline requests are
+    matched with the latest date each time slot was cached for."""
+    warmed = _get_warmed_whens() if offline else {}
+    requests_cache.install_cache(
+        CACHE_NAME,
+        backend="sqlite",
+        expire_after=EXPIRE_AFTER,
+        only_if_cached=offline,
+        stale_if_error=offline,
+        key_fn=functools.partial(_create_key, warmed=warmed) if warmed else None,
+    )
+
+
+def _get_warmed_whens() -> dict[tuple[str, TimeValue], str]:
+    """The latest timestamp cached for each host and time slot"""
+    warmed: dict[tuple[str, TimeValue], str] = {}
+    for entry in list_entries():
+        if entry.when is None or (time := entry.time_slot) is None:
+            continue
+        key = (entry.host, time)
+        if key not in warmed or datetime.datetime.fromisoformat(
+            warmed[key]
+        ) < datetime.datetime.fromisoformat(entry.when):
+            warmed[key] = entry.when
+    return warmed
+
+
+def _create_key(
+    request: AnyRequest, warmed: dict[tuple[str, TimeValue], str], **kwargs: Any
+) -> str:
+    """Cache key of the request as if it were sent for the date its time slot was cached for"""
+    request = normalize_request(request)
+    url = urlparse(request.url or "")
+    params = parse_qsl(url.query, keep_blank_values=True)
+    replaced = [
+        (name, _get_warmed_when(warmed, url.netloc, value))
+        if name in WHEN_PARAMETERS
+        else (name, value)
+        for name, value in params
+    ]
+    if replaced != params:
+        request.url = url._replace(query=urlencode(replaced)).geturl()
+    return create_key(request, **kwargs)
+
+
+def _get_warmed_when(
+    warmed: dict[tuple[str, TimeValue], str], host: str, when: str
+) -> str:
+    time = get_time_slot(when)
+    return warmed.get((host, time), when) if time is not None else when
+
+
+def _get_backend() -> BaseCache:
+    return requests_cache.CachedSession(CACHE_NAME, backend="sqlite").cache
+
+
+def _to_entry(response: CachedResponse) -> CacheEntry:
+    url = urlparse(response.url)
+    params = {k: v[0] for k, v in parse_qs(url.query).items()}
+    expires = response.expires
+    location = None
+    if url.path.endswith("/locations") and (body := response.json()):
+        location = body[0]["name"]
+    return CacheEntry(
+        key=response.cache_key,
+        host=url.netloc,
+        endpoint=url.path,
+        destination=params.get("address") or params.get("query"),
+        location=location,
+        when=next((params[p] for p in WHEN_PARAMETERS if p in params), None),
+        created_at=response.created_at.replace(tzinfo=datetime.UTC),
+        expires=expires.replace(tzinfo=datetime.UTC) if expires else None,
+        size=len(response.content or b""),
+    )
+
+
+def list_entries(
+    destination: str | None = None, time: TimeValue | None = None
+) -> Iterator[CacheEntry]:
+    """Yield all cached entries, optionally restricted to a destination and/or time slot. A
+    destination matches both as queried (locations) and as resolved by the locations api
+    (reachable-from), e.g. 'Mehringdamm' and 'U Mehringdamm (Berlin)'."""
+    entries = [_to_entry(response) for response in _get_backend().filter()]
+    names = None
+    if destination is not None:
+        names = {destination}
+        for entry in entries:
+            if entry.location is not None and destination in {
+                entry.destination,
+                entry.location,
+            }:
+                names |= {entry.destination or destination, entry.location}
+    yield from (entry for entry in entries if entry.matches(names, time))
+
+
+def print_entries(
+    destination: str | None = None, time: TimeValue | None = None
+) -> None:
+    """Print cached entries grouped by destination and time slot"""
+    entries = sorted(
+        list_entries(destination, time),
+        key=lambda e: (e.destination or "", e.when or "", e.endpoint),
+    )
+    for entry in entries:
+        print(
+            f"{entry.destination or '-':<30} {entry.when or '-':<26} {entry.endpoint:<24} "
+            f"{entry.size:>9} B  created {entry.created_at:%Y-%m-%d %H:%M}"
+            f"{'  (expired)' if entry.is_expired else ''}"
+        )
+    print(
+        f"{len(entries)} entries, {sum(e.size for e in entries)} bytes, "
+        f"{sum(e.is_expired for e in entries)} expired"
+    )
+
+
+def prune(
+    *,
+    expired: bool = True,
+    older_than: datetime.timedelta | None = None,
+    destination: str | None = None,
+    time: TimeValue | None = None,
+) -> int:
+    """Delete expired entries, entries older than older_than and/or all entries of a
+    destination and/or time slot; returns the number of deleted entries"""
+    now = datetime.datetime.now(tz=datetime.UTC)
+    selected = (
+        {entry.key for entry in list_entries(destination, time)}
+        if destination is not None or time is not None
+        else set()
+    )
+    keys = [
+        entry.key
+        for entry in list_entries()
+        if (expired and entry.is_expired)
+        or (older_than is not None and entry.created_at < now - older_than)
+        or entry.key in selected
+    ]
+    _get_backend().delete(*keys)
+    logger.info(f"Deleted {len(keys)} cache entries.")
+    return len(keys)
+
+
+def warm(
+    destinations: list[str],
+    options: list[QueryOptions],
+    max_duration: int,
+    workers: int = 8,
+) -> None:
+    """Pre-fetch the locations and reachable stops for all combinations of destinations and
+    query options (i.e. time slots) concurrently, so that a later run can be served from the
+    cache (e.g. offline); the provider's rate limit still applies."""
+    # pylint: disable-next=import-outside-toplevel
+    from berlin_public_transport_reachability.transport_api import BerlinTransportApi
+
+    install_cache()
+    apis = [
+        BerlinTransportApi(max_duration=max_duration, options=options_)
+        for options_ in options
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        destinations_ = list(executor.map(apis[0].get_destination, destinations))
+        fetches = [
+            executor.submit(api.get_reachable_stops_from, destination)
+            for destination in destinations_
+            for api in apis
+        ]
+        for fetch in fetches:
+            fetch.result()
+    logger.info(
+        f"Warmed cache for {len(destinations_)} destinations and {len(options)} time slots."
+    )
+
+
+def export(
+    path: Path, destination: str | None = None, time: TimeValue | None = None
+) -> None:
+    """Export cached entries incl. their json bodies as json lines, optionally restricted to a
+    destination and/or time slot"""
+    entries = {entry.key: entry for entry in list_entries(destination, time)}
+    count = 0
+    with path.open("w", encoding="utf-8") as file:
+        for response in _get_backend().filter():
+            if (entry := entries.get(response.cache_key)) is None:
+                continue
+            record = {
+                "url": response.url,
+                "endpoint": entry.endpoint,
+                "destination": entry.destination,
+                "when": entry.when,
+                "created_at": entry.created_at.isoformat(),
+                "expires": entry.expires.isoformat() if entry.expires else None,
+                "body": response.json(),
+            }
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    logger.info(f"Exported {count} cache entries to {path}.")
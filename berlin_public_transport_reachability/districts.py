@@ -0,0 +1,114 @@
+"""Parallel district processing: polygon construction and station assignment are spread over
+a process pool, which both stages can share. Geometries cross process boundaries as WKB
+buffers, stations as plain coordinate tuples."""
+import logging
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any
+
+import shapely
+from shapely.geometry import shape
+
+from berlin_public_transport_reachability.entities import GeoGeometry
+from berlin_public_transport_reachability.station import Station
+
+logger = logging.getLogger(__name__)
+
+
+def _geometries_to_wkb(geometries: list[GeoGeometry]) -> list[bytes]:
+    """Build shapely geometries from geojson geometry dicts and return them as WKB"""
+    return [shapely.to_wkb(shape(geometry)) for geometry in geometries]
+
+
+def _assign_chunk(
+    polygons_wkb: list[bytes], offset: int, coordinates: list[tuple[float, float]]
+) -> list[tuple[int, int]]:
+    """Return (station index, polygon index) pairs for all polygons containing a station of
+    the chunk; coordinates are (longitude, latitude). The pool is shared with building the
+    polygons and so created before they exist: they come with each chunk (one per worker)
+    instead of through a pool initializer."""
+    polygons = shapely.from_wkb(polygons_wkb)
+    shapely.prepare(polygons)
+    return _assign(list(polygons), offset, coordinates)
+
+
+def _assign(
+    polygons: list[Any], offset: int, coordinates: list[tuple[float, float]]
+) -> list[tuple[int, int]]:
+    points = shapely.points(coordinates)
+    tree = shapely.STRtree(points)
+    pairs: list[tuple[int, int]] = []
+    for polygon_index, polygon in enumerate(polygons):
+        for point_index in tree.query(polygon, predicate="contains"):
+            pairs.append((offset + int(point_index), polygon_index))
+    return pairs
+
+
+def _chunks(items: list[Any], count: int) -> list[list[Any]]:
+    size = max(1, -(-len(items) // count))
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+@contextmanager
+def district_pool(workers: int) -> Iterator[Executor | None]:
+    """One process pool for all district stages, or None with a single worker to run them in
+    this process"""
+    if workers <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield executor
+
+
+def build_geometries(
+    geometries: list[GeoGeometry], workers: int = 1, executor: Executor | None = None
+) -> list[Any]:
+    """Build shapely geometries from geojson geometry dicts, optionally in parallel in the
+    executor (a pool of its own is created if none is given)"""
+    if workers <= 1 or len(geometries) < 2:
+        return [shape(geometry) for geometry in geometries]
+    if executor is None:
+        with district_pool(workers) as pool:
+            return build_geometries(geometries, workers=workers, executor=pool)
+    wkb_chunks = executor.map(_geometries_to_wkb, _chunks(geometries, workers))
+    return [
+        geometry for wkb_chunk in wkb_chunks for geometry in shapely.from_wkb(wkb_chunk)
+    ]
+
+
+def assign_stations(
+    polygons: list[Any],
+    stations: list[Station],
+    workers: int = 1,
+    executor: Executor | None = None,
+) -> list[tuple[int, int]]:
+    """Determine which polygons contain which stations, optionally in parallel in the executor
+    (a pool of its own is created if none is given). Returns (station index, polygon index)
+    pairs sorted by station, then polygon, regardless of the number of workers."""
+    coordinates = [
+        station.get_coordinates(latitude_first=False) for station in stations
+    ]
+    if not coordinates:
+        return []
+    if workers <= 1:
+        shapely.prepare(polygons)
+        pairs = _assign(polygons, 0, coordinates)
+    elif executor is None:
+        with district_pool(workers) as pool:
+            return assign_stations(polygons, stations, workers=workers, executor=pool)
+    else:
+        polygons_wkb = list(shapely.to_wkb(polygons))
+        chunks = _chunks(coordinates, workers)
+        offsets = [i * len(chunks[0]) for i in range(len(chunks))]
+        pairs = [
+            pair
+            for chunk_pairs in executor.map(
+                _assign_chunk, [polygons_wkb] * len(chunks), offsets, chunks
+            )
+            for pair in chunk_pairs
+        ]
+    logger.debug(
+        f"Assigned {len(pairs)} station/polygon pairs using {workers} worker(s)"
+    )
+    return sorted(pairs)
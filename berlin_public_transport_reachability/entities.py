@@ -1,13 +1,24 @@
-from typing import TypedDict
+import functools
+from dataclasses import dataclass, field
+from typing import Any, TypedDict
 
-from colour import Color
 from pydantic import BaseModel
 
-from berlin_public_transport_reachability.settings import settings
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.providers import PROVIDERS, Provider
+from berlin_public_transport_reachability.settings import get_settings
 
-color_map = tuple(
-    Color("green").range_to(Color("red"), settings.general.max_duration)  #  * 2)
-)  # n steps from green to red
+
+@functools.cache
+def get_color_map() -> tuple[Any, ...]:
+    """n steps from green to red, n being the max. duration; built on first use"""
+    from colour import Color  # pylint: disable=import-outside-toplevel
+
+    return tuple(
+        Color("green").range_to(
+            Color("red"), get_settings().general.max_duration
+        )  #  * 2)
+    )
 
 
 class GeoProperties(TypedDict):
@@ -33,6 +44,25 @@ class GeoFeature(TypedDict):
     product_codes: list[str]
 
 
+# properties of an ortsteil shown in its tooltip on the map, and their labels
+TOOLTIP_FIELDS = [
+    "OTEIL",
+    "BEZIRK",
+    "average_duration",
+    "min_duration",
+    "max_duration",
+    "count_stations",
+]
+TOOLTIP_ALIASES = [
+    "Ortsteil",
+    "Bezirk",
+    "Weighted Average Duration",
+    "Min. Duration",
+    "Max. Duration",
+    "Count Stations",
+]
+
+
 abbreviation_map = {
     "suburban": "S",
     "subway": "U",
@@ -62,6 +92,38 @@ class DestinationProducts(BaseModel):
     def as_list(self) -> list[str]:
         return [abbreviation_map[k] for k, v in self.dict().items() if v]
 
+    def as_bitmask(self) -> int:
+        """Encode the products as bitmask, one bit per product in field order"""
+        return sum(1 << i for i, v in enumerate(self.dict().values()) if v)
+
+    @classmethod
+    def from_bitmask(cls, bitmask: int) -> "DestinationProducts":
+        return cls(
+            **{k: bool(bitmask & (1 << i)) for i, k in enumerate(cls.__fields__)}
+        )
+
+
+# products queried unless specified otherwise
+DEFAULT_PRODUCTS = DestinationProducts(
+    suburban=True,  # S-Bahn
+    subway=True,  # U-Bahn
+    tram=True,  # Tram
+    bus=True,  # Bus
+    ferry=False,  # Ferry
+    express=False,  # ICE/IC
+    regional=False,  # RE/RB
+)
+
+
+@dataclass(frozen=True)
+class QueryOptions:
+    """What is queried for every destination, apart from the duration"""
+
+    time: TimeValue
+    max_transfers: int
+    provider: Provider = PROVIDERS["bvg"]
+    products: DestinationProducts = field(default_factory=DEFAULT_PRODUCTS.copy)
+
 
 class DestinationLocation(BaseModel):
     latitude: float  # e.g. 52.521508
@@ -1,16 +1,25 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from berlin_public_transport_reachability.entities import (
     Destination,
     GeoFeature,
+    QueryOptions,
     ReachableInMinutes,
 )
-from berlin_public_transport_reachability.enums import TimeValue
-from berlin_public_transport_reachability.ortsteil import Ortsteil
+from berlin_public_transport_reachability.providers import Provider
 from berlin_public_transport_reachability.station import Station
-from berlin_public_transport_reachability.transport_api import BerlinTransportApi
+
+if TYPE_CHECKING:
+    from berlin_public_transport_reachability.ortsteil import Ortsteil
+    from berlin_public_transport_reachability.stop_matrix import StopMatrix
+
+# shapely (districts, ortsteil) and requests (transport_api) are imported where needed to keep
+# startup fast for runs that don't use them
 
 logger = logging.getLogger(__name__)
 
@@ -18,58 +27,122 @@ logger = logging.getLogger(__name__)
 def fetch_api_data(
     destinations: list[str],
     max_duration: int,
-    max_transfers: int,
-    time: TimeValue,
+    options: QueryOptions,
 ) -> tuple[list[Destination], dict[str, list[ReachableInMinutes]]]:
     """fetch the data from the transport api and return the raw data"""
-    bvg = BerlinTransportApi(
-        max_duration=max_duration, time=time, max_transfers=max_transfers
-    )
-    destinations_: list[Destination] = [bvg.get_destination(d) for d in destinations]
+    # pylint: disable-next=import-outside-toplevel
+    from berlin_public_transport_reachability.transport_api import BerlinTransportApi
+
+    api = BerlinTransportApi(max_duration=max_duration, options=options)
+    destinations_: list[Destination] = [api.get_destination(d) for d in destinations]
     reachable_by_destinations = {}
     for destination in destinations_:
-        reachable = bvg.get_reachable_stops_from(destination)
+        reachable = api.get_reachable_stops_from(destination)
         reachable_by_destinations[destination.name] = reachable
 
     return destinations_, reachable_by_destinations
 
 
-def unserialize_stations(
-    reachable_by_destinations: dict[str, list[ReachableInMinutes]], max_duration: int
-) -> list[Station]:
-    """unserialize the stations from the raw data"""
-    reachable_stations: list[Station] = []
-    # for each destination (that has a list of durations)
-    for destination, durations in reachable_by_destinations.items():
-        # each duration has a list of stations
-        for stops_by_duration in durations:
-            # for each station, create a Station instance or, if it already exists, add the
-            # duration to the existing instance
-            for stop in stops_by_duration.stations:  # ["stations"]:
-                if (
-                    station := next(
-                        (x for x in reachable_stations if x.name == stop.name), None
-                    )
-                ) is None:
-                    coordinates = stop.coordinates
-                    station = Station(
-                        name=stop.name,
-                        coordinates=coordinates,
-                        products=stop.products,
-                    )
-                    reachable_stations.append(station)
-                station.add_duration(destination, stops_by_duration.duration)
+def fetch_stations_with_matrix(
+    destinations: list[str],
+    max_duration: int,
+    horizon: int,
+    options: QueryOptions,
+    stop_matrix: "StopMatrix",
+) -> tuple[list[Destination], list[Station]]:
+    """like fetch_api_data with the given horizon followed by unserialize_stations, but
+    destinations that are swept stops of a matching stop matrix (by name or as resolved by the
+    locations api) are answered from the matrix without querying their reachable stops
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from berlin_public_transport_reachability.transport_api import BerlinTransportApi
+
+    api = BerlinTransportApi(max_duration=horizon, options=options)
+    if mismatches := stop_matrix.mismatches(options, horizon):
+        logger.warning(
+            f"Not using the stop matrix in {stop_matrix.path}, it differs in "
+            f"{', '.join(mismatches)}."
+        )
+    usable = not mismatches
+    destinations_: list[Destination] = []
+    rows: dict[str, int] = {}
+    reachable_by_destinations: dict[str, list[ReachableInMinutes]] = {}
+    for query in destinations:
+        if usable and (i := stop_matrix.find(query)) is not None:
+            destination = stop_matrix.get_destination(i)
+        else:
+            destination = api.get_destination(query)
+            i = stop_matrix.find(destination.name) if usable else None
+        destinations_.append(destination)
+        if i is not None:
+            rows[destination.name] = i
+        else:
+            reachable_by_destinations[destination.name] = api.get_reachable_stops_from(
+                destination
+            )
+    logger.info(f"Answered {len(rows)} destinations from the stop matrix.")
+
+    stations = {s.name: s for s in stop_matrix.get_stations(rows, horizon)}
+    for destination_name, durations in reachable_by_destinations.items():
+        _add_reachable(stations, destination_name, durations)
+    return destinations_, _filter_stations(
+        list(stations.values()), [d.name for d in destinations_], max_duration
+    )
+
+
+def fetch_api_data_by_provider(
+    destinations_by_provider: dict[Provider, list[str]],
+    max_duration: int,
+    options: QueryOptions,
+) -> dict[Provider, tuple[list[Destination], dict[str, list[ReachableInMinutes]]]]:
+    """fetch the data for several providers (e.g. cities) concurrently, the provider of the
+    options being replaced by each; requests are throttled by each provider's own rate limit
+    and share one connection pool and cache"""
+    with ThreadPoolExecutor(max_workers=len(destinations_by_provider) or 1) as executor:
+        futures = {
+            provider: executor.submit(
+                fetch_api_data,
+                destinations=destinations,
+                max_duration=max_duration,
+                options=replace(options, provider=provider),
+            )
+            for provider, destinations in destinations_by_provider.items()
+        }
+        return {provider: future.result() for provider, future in futures.items()}
 
+
+def _add_reachable(
+    stations: dict[str, Station], destination: str, durations: list[ReachableInMinutes]
+) -> None:
+    """add the durations to a destination to the stations by name, creating missing ones"""
+    # each duration has a list of stations
+    for stops_by_duration in durations:
+        # for each station, create a Station instance or, if it already exists, add the
+        # duration to the existing instance
+        for stop in stops_by_duration.stations:
+            if (station := stations.get(stop.name)) is None:
+                station = Station(
+                    name=stop.name,
+                    coordinates=stop.coordinates,
+                    products=stop.products,
+                )
+                stations[stop.name] = station
+            station.add_duration(destination, stops_by_duration.duration)
+
+
+def _filter_stations(
+    stations: list[Station], destinations: list[str], max_duration: int
+) -> list[Station]:
+    """fill in the durations to destinations a station was not found for and keep the stations
+    within max_duration on average"""
     # if a station lacks a connection to one of the destinations, add a duration of MAX_DURATION
-    for station in reachable_stations:
-        for destination in reachable_by_destinations:
-            if destination not in station.durations:
-                station.add_duration_not_found(destination)
+    for station in stations:
+        station.fill_durations_not_found(destinations, max_duration)
 
     # remove stations with an average duration > MAX_DURATION
     reachable_stations_in_time = [
         station
-        for station in reachable_stations
+        for station in stations
         if station.get_weighted_duration() <= max_duration
     ]
     logger.info(
@@ -80,19 +153,52 @@ def unserialize_stations(
     return reachable_stations_in_time
 
 
-def load_ortsteile(path: Path, stations: list[Station]) -> list[Ortsteil]:
-    """load the geojson file with the ortsteile and add the reachable stations to each ortsteil"""
+def unserialize_stations(
+    reachable_by_destinations: dict[str, list[ReachableInMinutes]], max_duration: int
+) -> list[Station]:
+    """unserialize the stations from the raw data"""
+    stations: dict[str, Station] = {}
+    # for each destination (that has a list of durations)
+    for destination, durations in reachable_by_destinations.items():
+        _add_reachable(stations, destination, durations)
+    return _filter_stations(
+        list(stations.values()), list(reachable_by_destinations), max_duration
+    )
+
+
+def load_ortsteile(
+    path: Path, stations: list[Station], workers: int = 1
+) -> list["Ortsteil"]:
+    """load the geojson file with the ortsteile and add the reachable stations to each ortsteil;
+    with workers > 1, building the polygons and assigning the stations runs in one process pool
+    """
+    # pylint: disable=import-outside-toplevel
+    from berlin_public_transport_reachability.districts import (
+        assign_stations,
+        build_geometries,
+        district_pool,
+    )
+    from berlin_public_transport_reachability.ortsteil import Ortsteil
+
     with path.open(encoding="utf-8") as file:
         features: list[GeoFeature] = json.load(file)["features"]
-    ortsteile = [Ortsteil(f) for f in features]
+    with district_pool(workers) as executor:
+        geometries = build_geometries(
+            [f["geometry"] for f in features], workers=workers, executor=executor
+        )
+        ortsteile = [
+            Ortsteil(f, geometry=g) for f, g in zip(features, geometries, strict=True)
+        ]
+        pairs = assign_stations(
+            [o.shape for o in ortsteile], stations, workers=workers, executor=executor
+        )
 
-    for station in stations:
-        found = False
-        for ortsteil in ortsteile:
-            if ortsteil.contains_station(station=station):
-                ortsteil.add_station(station)
-                found = True
-        if not found:
+    found: set[int] = set()
+    for station_index, ortsteil_index in pairs:
+        ortsteile[ortsteil_index].add_station(stations[station_index])
+        found.add(station_index)
+    for station_index, station in enumerate(stations):
+        if station_index not in found:
             logger.debug(f"Station {station.name} not found in any Ortsteil")
 
     # we need to calculate the average duration for each ortsteil as it must be stored at specific
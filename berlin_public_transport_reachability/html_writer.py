@@ -0,0 +1,226 @@
+"""Streaming alternative to the folium based ReachableMap: the page is written to disk as a
+fixed Leaflet bootstrap followed by data chunks, so no element tree is built in memory and
+memory stays flat regardless of the number of stations"""
+import json
+import webbrowser
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+from types import TracebackType
+from typing import IO, TYPE_CHECKING
+
+from berlin_public_transport_reachability.entities import (
+    TOOLTIP_ALIASES,
+    TOOLTIP_FIELDS,
+    Destination,
+)
+from berlin_public_transport_reachability.routes import ROUTE_SCRIPT
+from berlin_public_transport_reachability.station import Station
+
+if TYPE_CHECKING:
+    from berlin_public_transport_reachability.ortsteil import Ortsteil
+
+# same resources as folium's default template
+_AWESOME_MARKERS = (
+    "https://cdnjs.cloudflare.com/ajax/libs/Leaflet.awesome-markers/2.0.2"
+)
+_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+    <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+    <script src="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js"></script>
+    <script src="__AWESOME_MARKERS__/leaflet.awesome-markers.js"></script>
+    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css"/>
+    <link rel="stylesheet"
+        href="https://cdn.jsdelivr.net/npm/@fortawesome/fontawesome-free@6.2.0/css/all.min.css"/>
+    <link rel="stylesheet" href="__AWESOME_MARKERS__/leaflet.awesome-markers.css"/>
+    <meta name="viewport"
+        content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no" />
+    <style>
+        html, body { width: 100%; height: 100%; margin: 0; padding: 0; }
+        #map { position: relative; width: 100%; height: 100%; }
+        .leaflet-container { font-size: 1rem; }
+        .foliumtooltip table { margin: auto; }
+        .foliumtooltip tr { text-align: left; }
+        .foliumtooltip th { padding: 2px; padding-right: 8px; }
+    </style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var map = L.map("map", {center: __CENTER__, zoom: 12});
+L.control.scale().addTo(map);
+L.tileLayer("https://tile.openstreetmap.org/{z}/{x}/{y}.png", {
+    maxZoom: 19,
+    attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> ' +
+        'contributors'
+}).addTo(map);
+var icon = L.AwesomeMarkers.icon(
+    {markerColor: "blue", iconColor: "white", icon: "subway", prefix: "fa"});
+function addDestination(d) {
+    L.marker([d[0], d[1]], {icon: icon}).bindPopup(d[2]).addTo(map);
+}
+var stationsStyled = false;
+function addStations(stations) {
+    if (!stationsStyled) {
+        // avoid overlaying circles being displayed darker
+        document.head.insertAdjacentHTML("beforeend", "<style>g { opacity: 0.5; }</style>");
+        stationsStyled = true;
+    }
+    for (const s of stations) {
+        L.circle([s[0], s[1]], {radius: __RADIUS__, color: s[2], fillColor: s[2], fill: true,
+                  fillOpacity: 1.0, stroke: false})
+            .bindPopup(s[3], {maxWidth: 400}).addTo(map);
+    }
+}
+var fields = __FIELDS__;
+var aliases = __ALIASES__;
+function tooltip(layer) {
+    let value = v => (v === null || v === undefined) ? "" : v;
+    return "<table>" + fields.map((f, i) =>
+        `<tr><th>${aliases[i]}</th><td>${value(layer.feature.properties[f])}</td></tr>`
+    ).join("") + "</table>";
+}
+function addOrtsteil(feature, style) {
+    L.geoJson(feature, {style: style})
+        .bindTooltip(tooltip, {sticky: true, className: "foliumtooltip"})
+        .addTo(map);
+}
+""".replace(
+    "__AWESOME_MARKERS__", _AWESOME_MARKERS
+)
+_TAIL = """</script>
+__ROUTE_SCRIPT__</body>
+</html>
+"""
+
+
+def _chunked(items: Iterable[Station], size: int) -> Iterator[list[Station]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _to_js(value: object) -> str:
+    # keep "</script>" in names or popups from terminating the script block
+    return json.dumps(value, ensure_ascii=False).replace("</", "<\\/")
+
+
+class StreamingMapWriter:
+    """Write a Leaflet page incrementally: bootstrap, then destinations, stations and ortsteile
+    as they are passed in, then the closing tags"""
+
+    def __init__(
+        self,
+        path: Path,
+        center: tuple[float, float],
+        circle_radius: int,
+        chunk_size: int = 500,
+        *,
+        routes: bool = False,
+    ):
+        self.path = path
+        self.center = center
+        self.circle_radius = circle_radius  # in meters
+        self.chunk_size = chunk_size
+        self.routes = (
+            routes  # route links in the popups, only answered by the route server
+        )
+        self._file: IO[str] | None = None
+
+    def __enter__(self) -> "StreamingMapWriter":
+        self._file = self.path.open("w", encoding="utf-8")
+        self._file.write(
+            _HEAD.replace("__CENTER__", _to_js(list(self.center)))
+            .replace("__RADIUS__", str(self.circle_radius))
+            .replace("__FIELDS__", _to_js(TOOLTIP_FIELDS))
+            .replace("__ALIASES__", _to_js(TOOLTIP_ALIASES))
+        )
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._file is not None:
+            self._file.write(
+                _TAIL.replace("__ROUTE_SCRIPT__", ROUTE_SCRIPT if self.routes else "")
+            )
+            self._file.close()
+            self._file = None
+
+    def _write(self, text: str) -> None:
+        if self._file is None:
+            raise RuntimeError("StreamingMapWriter must be used as context manager")
+        self._file.write(text)
+
+    def write_destinations(self, destinations: Iterable[Destination]) -> None:
+        for destination in destinations:
+            data = [*destination.coordinates, destination.name]
+            self._write(f"addDestination({_to_js(data)});\n")
+
+    def write_stations(self, stations: Iterable[Station]) -> None:
+        """Write the stations in chunks, in the given order (later ones are drawn on top)"""
+        for chunk in _chunked(stations, self.chunk_size):
+            data = [
+                [
+                    *station.coordinates,
+                    station.get_color(),
+                    station.get_popup_text(routes=self.routes),
+                ]
+                for station in chunk
+            ]
+            self._write(f"addStations({_to_js(data)});\n")
+
+    def write_ortsteile(self, ortsteile: Iterable["Ortsteil"]) -> None:
+        for ortsteil in ortsteile:
+            feature = _to_js(ortsteil.feature)
+            style = _to_js(ortsteil.get_style(ortsteil.feature))
+            self._write(f"addOrtsteil({feature}, {style});\n")
+
+
+def _get_center(destinations: list[Destination]) -> tuple[float, float]:
+    """Determine the geographical center of the destinations"""
+    latitudes = [destination.location.latitude for destination in destinations]
+    longitudes = [destination.location.longitude for destination in destinations]
+    return sum(latitudes) / len(latitudes), sum(longitudes) / len(longitudes)
+
+
+def stream_reachable_stations(
+    destinations: list[Destination],
+    stations: list[Station],
+    circle_radius: int,
+    path: Path = Path("index.html"),
+    *,
+    open_browser: bool = True,
+    routes: bool = False,
+) -> None:
+    """Streaming counterpart of ReachableMap.draw_reachable_stations"""
+    with StreamingMapWriter(
+        path, _get_center(destinations), circle_radius, routes=routes
+    ) as writer:
+        writer.write_destinations(destinations)
+        # sort stations from green to red to avoid green being overwritten by red
+        writer.write_stations(
+            sorted(stations, key=lambda x: x.get_weighted_duration(), reverse=True)
+        )
+    if open_browser:
+        webbrowser.open(str(path))
+
+
+def stream_ortsteile(
+    destinations: list[Destination],
+    ortsteile: list["Ortsteil"],
+    circle_radius: int,
+    path: Path = Path("index.html"),
+    *,
+    open_browser: bool = True,
+) -> None:
+    """Streaming counterpart of ReachableMap.draw_ortsteile"""
+    with StreamingMapWriter(path, _get_center(destinations), circle_radius) as writer:
+        writer.write_destinations(destinations)
+        writer.write_ortsteile(ortsteile)
+    if open_browser:
+        webbrowser.open(str(path))
@@ -1,14 +1,14 @@
 import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Literal, NotRequired, TypedDict
 
-import requests
-
 from berlin_public_transport_reachability.coordinates_finder import (
     Location,
     get_coordinates_by_addresss,
 )
 from berlin_public_transport_reachability.entities import abbreviation_map
+from berlin_public_transport_reachability.providers import PROVIDERS, Provider
+from berlin_public_transport_reachability.transport_api import get
 
 
 class ProductsResponse(TypedDict):
@@ -35,6 +35,10 @@ class OriginDestinationResponse(TypedDict):
     products: NotRequired[ProductsResponse]
 
 
+class LineResponse(TypedDict):
+    name: str  # e.g. 'U6'
+
+
 class LegResponse(TypedDict):
     origin: OriginDestinationResponse
     destination: OriginDestinationResponse
@@ -42,6 +46,7 @@ class LegResponse(TypedDict):
     arrival: str  # ISO 8601
     walking: NotRequired[bool]
     distance: NotRequired[int]
+    line: NotRequired[LineResponse]
 
 
 class JourneyResponse(TypedDict):
@@ -53,9 +58,13 @@ class ResultsResponse(TypedDict):
 
 
 def fetch_journeys(
-    location_origin: Location, location_destination: Location
+    location_origin: Location,
+    location_destination: Location,
+    provider: Provider = PROVIDERS["bvg"],
+    departure: str | None = None,
+    max_transfers: int | None = None,
 ) -> list[JourneyResponse]:
-    params = {
+    params: dict[str, int | float | str | bool] = {
         "from.latitude": location_origin.latitude,
         "from.longitude": location_origin.longitude,
         "from.address": location_origin.address,
@@ -63,8 +72,12 @@ def fetch_journeys(
         "to.longitude": location_destination.longitude,
         "to.address": location_destination.address,
     }
-    url = "https://v5.bvg.transport.rest/journeys"
-    response = requests.get(url, params=params, timeout=15)
+    if departure is not None:
+        params["departure"] = departure  # ISO 8601, defaults to now
+    if max_transfers is not None:
+        params["transfers"] = max_transfers
+    url = provider.base_url + "/journeys"
+    response = get(provider, url, params=params)
     results: ResultsResponse = response.json()
     if "journeys" not in results:
         raise ValueError(
@@ -81,6 +94,7 @@ class Journey:
     arrival: datetime.datetime
     duration: datetime.timedelta
     count_stopvers: int
+    lines: list[str] = field(default_factory=list)  # e.g. ['U6', 'S1']
 
     def __str__(self) -> str:
         return (
@@ -107,6 +121,7 @@ def parse_journey(journey: JourneyResponse) -> Journey:
         legs[-1]["destination"].get("name") or legs[-1]["destination"]["address"]
     )
     count_stopvers = len(legs) - 1
+    lines = [leg["line"]["name"] for leg in legs if "line" in leg]
 
     return Journey(
         origin_address=origin_address,
@@ -115,6 +130,7 @@ def parse_journey(journey: JourneyResponse) -> Journey:
         arrival=arrival,
         duration=duration,
         count_stopvers=count_stopvers,
+        lines=lines,
     )
 
 
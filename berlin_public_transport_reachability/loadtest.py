@@ -0,0 +1,188 @@
+"""Load test of the fetch path against the local stub server: drives BerlinTransportApi,
+fetch_api_data and journey_finder.fetch_journeys concurrently and reports throughput, tail
+latency and retries (requests seen by the server minus calls made by the client).
+
+    python -m berlin_public_transport_reachability.loadtest --calls 500 --concurrency 16 \\
+        --latency lognormal:80:0.6 --rate-429 0.05
+"""
+import logging
+import random
+import statistics
+import time
+from argparse import ArgumentParser
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+
+from berlin_public_transport_reachability.coordinates_finder import Location
+from berlin_public_transport_reachability.entities import Destination, QueryOptions
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.fetch import fetch_api_data
+from berlin_public_transport_reachability.journey_finder import fetch_journeys
+from berlin_public_transport_reachability.providers import Provider
+from berlin_public_transport_reachability.stub_server import (
+    StubServer,
+    add_stub_arguments,
+    stub_config_from_args,
+)
+from berlin_public_transport_reachability.transport_api import BerlinTransportApi
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    calls: int
+    elapsed: float  # in s
+    latencies: list[float] = field(default_factory=list)  # of successful calls, in s
+    requests_per_call: int = 1
+    errors: int = 0
+    server_requests: int = 0
+
+    def _percentile(self, percent: int) -> float:
+        if len(self.latencies) < 2:
+            return self.latencies[0] * 1000 if self.latencies else float("nan")
+        quantiles = statistics.quantiles(self.latencies, n=100, method="inclusive")
+        return quantiles[percent - 1] * 1000
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<14} {self.calls:>6} calls {self.calls / self.elapsed:>8.1f}/s  "
+            f"p50 {self._percentile(50):>7.1f} ms  p95 {self._percentile(95):>7.1f} ms  "
+            f"p99 {self._percentile(99):>7.1f} ms  max "
+            f"{max(self.latencies, default=0) * 1000:>7.1f} ms  errors {self.errors:>4}  "
+            f"retries {self.server_requests - self.calls * self.requests_per_call:>4}"
+        )
+
+
+def _run(
+    name: str,
+    server: StubServer,
+    calls: list[Callable[[], object]],
+    concurrency: int,
+    requests_per_call: int = 1,
+) -> ScenarioResult:
+    requests_before = sum(server.requests.values())
+    result = ScenarioResult(
+        name=name, calls=len(calls), elapsed=0, requests_per_call=requests_per_call
+    )
+
+    def timed(call: Callable[[], object]) -> float | None:
+        start = time.perf_counter()
+        try:
+            call()
+        except Exception:  # pylint: disable=broad-exception-caught
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency in executor.map(timed, calls):
+            if latency is None:
+                result.errors += 1
+            else:
+                result.latencies.append(latency)
+    result.elapsed = time.perf_counter() - start
+    result.server_requests = sum(server.requests.values()) - requests_before
+    return result
+
+
+def _location(destination: Destination) -> Location:
+    location = destination.location
+    return Location(destination.name, str(location.latitude), str(location.longitude))
+
+
+def run_load_test(
+    server: StubServer,
+    calls: int,
+    concurrency: int,
+    requests_per_second: float,
+    max_duration: int,
+) -> list[ScenarioResult]:
+    provider = Provider(
+        name="stub",
+        base_url=server.base_url,
+        timezone="Europe/Berlin",
+        requests_per_second=requests_per_second,
+    )
+    options = QueryOptions(
+        time=TimeValue.NEXT_WORKDAY_NOON, max_transfers=2, provider=provider
+    )
+    api = BerlinTransportApi(max_duration=max_duration, options=options)
+    rnd = random.Random(0)
+    names = [f"Destination {i}" for i in range(calls)]
+    # taken from the stub's data directly, so setting up doesn't suffer from injected errors
+    destinations = [Destination(**server.data.locations(n)[0]) for n in names[:50]]
+    origins = [rnd.choice(destinations) for _ in range(calls)]
+    routes = [
+        (rnd.choice(destinations), rnd.choice(destinations)) for _ in range(calls)
+    ]
+
+    return [
+        _run(
+            "locations",
+            server,
+            [partial(api.get_destination, n) for n in names],
+            concurrency,
+        ),
+        _run(
+            "reachable-from",
+            server,
+            [partial(api.get_reachable_stops_from, d) for d in origins],
+            concurrency,
+        ),
+        _run(
+            "journeys",
+            server,
+            [
+                partial(fetch_journeys, _location(a), _location(b), provider=provider)
+                for a, b in routes
+            ],
+            concurrency,
+        ),
+        # fetch_api_data is sequential per run; several runs are driven concurrently
+        _run(
+            "fetch_api_data",
+            server,
+            [
+                partial(
+                    fetch_api_data,
+                    destinations=names[i : i + 3],
+                    max_duration=max_duration,
+                    options=options,
+                )
+                for i in range(max(1, calls // 10))
+            ],
+            concurrency,
+            requests_per_call=6,  # 3 destinations: locations + reachable-from each
+        ),
+    ]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", help="Calls per scenario", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--rps", help="Client side rate limit (requests/s)", type=float, default=1000
+    )
+    parser.add_argument("--max-duration", type=int, default=60)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub = StubServer(("127.0.0.1", 0), stub_config_from_args(args)).start()
+    try:
+        for scenario in run_load_test(
+            stub,
+            calls=args.calls,
+            concurrency=args.concurrency,
+            requests_per_second=args.rps,
+            max_duration=args.max_duration,
+        ):
+            print(scenario)
+        print(f"server: {dict(sorted(stub.requests.items()))}")
+    finally:
+        stub.stop()
@@ -1,12 +1,20 @@
 import webbrowser
+from typing import TYPE_CHECKING, Any, cast
 
 import folium
 from folium import Popup
 
-from berlin_public_transport_reachability.entities import Destination
-from berlin_public_transport_reachability.ortsteil import Ortsteil
+from berlin_public_transport_reachability.entities import (
+    TOOLTIP_ALIASES,
+    TOOLTIP_FIELDS,
+    Destination,
+)
+from berlin_public_transport_reachability.routes import ROUTE_SCRIPT
 from berlin_public_transport_reachability.station import Station
 
+if TYPE_CHECKING:
+    from berlin_public_transport_reachability.ortsteil import Ortsteil
+
 # Example Latitudes/Longitudes:
 # Berlin
 # 52.520008, 13.404954
@@ -26,41 +34,64 @@ class ReachableMap:
         destinations: list[Destination],
         stations: list[Station],
         circle_radius: int,
+        *,
+        open_browser: bool = True,
+        routes: bool = False,
     ):
         self.destinations = destinations
         self.reachable_stations = stations
         self.circle_radius = circle_radius  # in meters
+        self.open_browser = (
+            open_browser  # e.g. not if the map is opened from the route server
+        )
+        self.routes = (
+            routes  # route links in the popups, only answered by the route server
+        )
         self.folium_map = self._draw_base_map()
 
     def draw_reachable_stations(self) -> None:
         """Draw the map with the given destinations as markers and the given stations as circles"""
         self._draw_base_map()
         self._draw_reachable_stops()
-        self.folium_map.save("index.html")
-        webbrowser.open("index.html")
+        self._save()
 
-    def draw_ortsteile(self, ortsteile: list[Ortsteil]) -> None:
+    def draw_variants(self, stations_by_variant: dict[str, list[Station]]) -> None:
+        """Draw the reachable stations of each variant as a separate, switchable layer"""
+        self._draw_base_map()
+        for index, (variant, stations) in enumerate(stations_by_variant.items()):
+            layer = folium.FeatureGroup(name=variant, show=index == 0)
+            self._draw_reachable_stops(stations=stations, parent=layer)
+            layer.add_to(self.folium_map)
+        folium.LayerControl(collapsed=False).add_to(self.folium_map)
+        self._save()
+
+    def draw_ortsteile(self, ortsteile: list["Ortsteil"]) -> None:
         self._draw_base_map()
         self._draw_ortsteile(ortsteile=ortsteile)
+        self._save()
+
+    def _save(self) -> None:
         self.folium_map.save("index.html")
-        webbrowser.open("index.html")
+        if self.open_browser:
+            webbrowser.open("index.html")
 
-    def _draw_reachable_stops(self) -> None:
-        """Draw the reachable stops as circles on the map"""
+    def _draw_reachable_stops(
+        self, stations: list[Station] | None = None, parent: Any = None
+    ) -> None:
+        """Draw the reachable stops (default: all) as circles on the map or the parent layer"""
         station_circles = []
+        stations = self.reachable_stations if stations is None else stations
 
         # sort stations from green to red to avoid green being overwritten
         # by red
-        self.reachable_stations.sort(
-            key=lambda x: x.get_weighted_duration(), reverse=True
-        )
+        stations.sort(key=lambda x: x.get_weighted_duration(), reverse=True)
 
-        for station in self.reachable_stations:
+        for station in stations:
             coordinates = station.coordinates
             station_circle = folium.Circle(
                 radius=self.circle_radius,
                 location=coordinates,
-                popup=Popup(station.get_popup_text(), max_width=400),
+                popup=Popup(station.get_popup_text(routes=self.routes), max_width=400),
                 color=station.get_color(),
                 fill=True,
                 # fill_color="green",
@@ -71,7 +102,7 @@ class ReachableMap:
             station_circles.append(station_circle)
 
         for station_circle in station_circles:
-            station_circle.add_to(self.folium_map)
+            station_circle.add_to(self.folium_map if parent is None else parent)
 
         # we need a div around each circle setting opacity to avoid
         # overlaying circles being displayed darker
@@ -114,34 +145,23 @@ class ReachableMap:
                     color="blue", icon="subway", prefix="fa"
                 ),  # https://fontawesome.com/v4/icons/
             ).add_to(folium_map)
+        if self.routes:
+            # the root of a map is its figure
+            cast(folium.Figure, folium_map.get_root()).html.add_child(
+                folium.Element(ROUTE_SCRIPT)
+            )
 
         return folium_map
 
-    def _draw_ortsteile(self, ortsteile: list[Ortsteil]) -> None:
+    def _draw_ortsteile(self, ortsteile: list["Ortsteil"]) -> None:
         """Draw the ortsteile as polygons from geojson file on the map"""
-        fields = [
-            "OTEIL",
-            "BEZIRK",
-            "average_duration",
-            "min_duration",
-            "max_duration",
-            "count_stations",
-        ]
-        aliases = [
-            "Ortsteil",
-            "Bezirk",
-            "Weighted Average Duration",
-            "Min. Duration",
-            "Max. Duration",
-            "Count Stations",
-        ]
         for ortsteil in ortsteile:
             geojson = folium.GeoJson(
                 ortsteil.feature,
                 style_function=ortsteil.get_style,
                 tooltip=folium.features.GeoJsonTooltip(
-                    fields=fields,
-                    aliases=aliases,
+                    fields=TOOLTIP_FIELDS,
+                    aliases=TOOLTIP_ALIASES,
                 ),
             )
             geojson.add_to(self.folium_map)
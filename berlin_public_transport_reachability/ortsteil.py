@@ -1,15 +1,14 @@
 from math import ceil
 from typing import Any
 
-from shapely import Point
 from shapely.geometry import shape
 
-from berlin_public_transport_reachability.entities import GeoFeature, color_map
+from berlin_public_transport_reachability.entities import GeoFeature, get_color_map
 from berlin_public_transport_reachability.station import Station
 
 
 class Ortsteil:  # pylint: disable=too-many-instance-attributes
-    def __init__(self, geojson_feature: GeoFeature):
+    def __init__(self, geojson_feature: GeoFeature, geometry: Any | None = None):
         self.alias = geojson_feature["properties"]["spatial_alias"]
         self.ortsteil = geojson_feature["properties"]["OTEIL"]
         self.bezirk = geojson_feature["properties"]["BEZIRK"]
@@ -19,7 +18,10 @@ class Ortsteil:  # pylint: disable=too-many-instance-attributes
             raise ValueError
         # self.geometry = geojson_feature["geometry"]
         self.feature: GeoFeature = geojson_feature
-        self.shape = shape(geojson_feature["geometry"])
+        # the shape may have been built beforehand, e.g. in a worker process
+        self.shape = (
+            geometry if geometry is not None else shape(geojson_feature["geometry"])
+        )
 
         self.stations: list[Station] = []
         self.average_duration: int | None = None
@@ -27,11 +29,6 @@ class Ortsteil:  # pylint: disable=too-many-instance-attributes
     def __repr__(self) -> str:
         return f"Ortsteil({self.ortsteil} in {self.bezirk})"
 
-    def contains_station(self, station: Station) -> bool:
-        return bool(
-            self.shape.contains(Point(station.get_coordinates(latitude_first=False)))
-        )
-
     def add_station(self, station: Station) -> None:
         self.stations.append(station)
 
@@ -63,7 +60,7 @@ class Ortsteil:  # pylint: disable=too-many-instance-attributes
         if self.average_duration is None:
             color = "#000000"
         else:
-            color = color_map[self.average_duration - 1].get_hex()
+            color = get_color_map()[self.average_duration - 1].get_hex()
         return {
             "fillColor": color,
             "fillOpacity": 0.5,
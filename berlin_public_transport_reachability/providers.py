@@ -0,0 +1,100 @@
+"""Transport.rest/HAFAS providers: everything that differs between regions (base url,
+timezone, product names, region polygons, rate limit)"""
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+STATIC_PATH = Path(__file__).resolve().parent.parent.joinpath("static")
+
+# our product names (fields of DestinationProducts) in bitmask order
+PRODUCTS = ("suburban", "subway", "tram", "bus", "ferry", "express", "regional")
+
+
+class RateLimiter:
+    """Thread-safe limiter allowing at most requests_per_second requests"""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1 / requests_per_second
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        """Block until the next request may be sent"""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+@dataclass(frozen=True, eq=False)  # hashable by identity, i.e. usable as dict key
+class Provider:
+    name: str
+    base_url: str
+    timezone: str
+    # our product name -> the provider's product name(s)
+    products: dict[str, tuple[str, ...]] = field(
+        default_factory=lambda: {p: (p,) for p in PRODUCTS}
+    )
+    regions_path: Path | None = None  # geojson with region polygons (Ortsteile schema)
+    requests_per_second: float = 1.5
+    rate_limiter: RateLimiter = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "rate_limiter", RateLimiter(self.requests_per_second))
+
+    def products_to_params(self, products: dict[str, bool]) -> dict[str, bool]:
+        """Translate our product flags to the provider's query parameters"""
+        return {
+            provider_product: products[product]
+            for product, provider_products in self.products.items()
+            for provider_product in provider_products
+        }
+
+    def products_from_response(self, products: dict[str, Any]) -> dict[str, bool]:
+        """Translate the provider's product flags of a stop to ours"""
+        return {
+            product: any(bool(products.get(p)) for p in provider_products)
+            for product, provider_products in self.products.items()
+        }
+
+
+PROVIDERS: dict[str, Provider] = {
+    "bvg": Provider(
+        name="bvg",
+        base_url="https://v5.bvg.transport.rest",
+        timezone="Europe/Berlin",
+        regions_path=STATIC_PATH.joinpath("lor_ortsteile.geojson"),
+    ),
+    "vbb": Provider(
+        name="vbb",
+        base_url="https://v6.vbb.transport.rest",
+        timezone="Europe/Berlin",
+        # the Berlin Ortsteile cover only part of the vbb area
+    ),
+    "db": Provider(
+        name="db",
+        base_url="https://v6.db.transport.rest",
+        timezone="Europe/Berlin",
+        products={
+            "suburban": ("suburban",),
+            "subway": ("subway",),
+            "tram": ("tram",),
+            "bus": ("bus",),
+            "ferry": ("ferry",),
+            "express": ("nationalExpress", "national"),
+            "regional": ("regionalExpress", "regional"),
+        },
+    ),
+}
+
+
+def get_provider(name: str) -> Provider:
+    if name not in PROVIDERS:
+        raise ValueError(
+            f"Unknown provider {name}. Choose one of {', '.join(PROVIDERS)}."
+        )
+    return PROVIDERS[name]
@@ -0,0 +1,228 @@
+"""Indexed queries over stations, their durations and their districts, e.g. "stations reaching
+all destinations within 30 min, with U-Bahn, in Bezirk X, sorted by worst-case duration"."""
+import csv
+import json
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import IO, TYPE_CHECKING, Literal
+
+import numpy as np
+
+from berlin_public_transport_reachability.entities import DestinationProducts
+from berlin_public_transport_reachability.station import Station
+
+if TYPE_CHECKING:
+    from berlin_public_transport_reachability.ortsteil import Ortsteil
+
+# duration of destinations a station was not found for; it fails every range filter and sorts last
+NOT_REACHED = np.iinfo(np.uint16).max
+
+
+@dataclass
+class StationQuery:
+    max_durations: dict[str, int] = field(default_factory=dict)  # per destination
+    max_duration: int | None = None  # applies to all destinations
+    max_average: int | None = None
+    products: DestinationProducts | None = None  # stations must offer all of them
+    bezirk: str | None = None
+    ortsteil: str | None = None
+    sort_by: str = "worst"  # 'worst', 'average' or a destination
+    limit: int | None = None
+
+
+@dataclass
+class QueryResult:
+    station: Station
+    worst: int | None  # None if not reached from all destinations
+    average: int | None
+    ortsteil: str | None
+    bezirk: str | None
+
+    def as_dict(self) -> dict[str, str | int | float | None]:
+        return {
+            "name": self.station.name,
+            "latitude": self.station.coordinates[0],
+            "longitude": self.station.coordinates[1],
+            "products": ",".join(self.station.products.as_list()),
+            "ortsteil": self.ortsteil,
+            "bezirk": self.bezirk,
+            "worst": self.worst,
+            "average": self.average,
+            **{
+                d: None if d in self.station.not_found else v
+                for d, v in self.station.durations.items()
+            },
+        }
+
+
+class StationIndex:
+    """Columnar index over stations: a duration matrix with one sorted index per destination,
+    product bitmasks and district memberships. Destinations a station was not found for are
+    indexed as NOT_REACHED rather than by their placeholder durations, so range queries never
+    match them"""
+
+    def __init__(
+        self, stations: list[Station], ortsteile: list["Ortsteil"] | None = None
+    ):
+        self.stations = stations
+        self.destinations: list[str] = list(stations[0].durations) if stations else []
+        self._destination_index = {d: i for i, d in enumerate(self.destinations)}
+        self.durations = np.array(
+            [
+                [
+                    NOT_REACHED if d in s.not_found else s.durations[d]
+                    for d in self.destinations
+                ]
+                for s in stations
+            ],
+            dtype=np.uint16,
+        ).reshape(len(stations), len(self.destinations))
+        self.worst: np.ndarray = self.durations.max(axis=1, initial=0)
+        self.average = np.array(
+            [
+                NOT_REACHED if s.not_found else s.get_weighted_duration()
+                for s in stations
+            ],
+            dtype=np.uint16,
+        )
+        self.products = np.array(
+            [s.products.as_bitmask() for s in stations], dtype=np.uint8
+        )
+
+        # per destination: station indices sorted by duration and the sorted durations
+        self._order = np.argsort(self.durations, axis=0, kind="stable")
+        self._sorted = np.take_along_axis(self.durations, self._order, axis=0)
+        self._worst_order = np.argsort(self.worst, kind="stable")
+
+        self.ortsteil_of: list[str | None] = [None] * len(stations)
+        self.bezirk_of: list[str | None] = [None] * len(stations)
+        self._by_ortsteil: dict[str, np.ndarray] = {}
+        self._by_bezirk: dict[str, np.ndarray] = {}
+        if ortsteile:
+            self._index_regions(ortsteile)
+
+    def _index_regions(self, ortsteile: list["Ortsteil"]) -> None:
+        position = {id(s): i for i, s in enumerate(self.stations)}
+        by_ortsteil: dict[str, list[int]] = {}
+        by_bezirk: dict[str, list[int]] = {}
+        for ortsteil in ortsteile:
+            for station in ortsteil.stations:
+                if (i := position.get(id(station))) is None:
+                    continue
+                self.ortsteil_of[i] = self.ortsteil_of[i] or ortsteil.ortsteil
+                self.bezirk_of[i] = self.bezirk_of[i] or ortsteil.bezirk
+                by_ortsteil.setdefault(ortsteil.ortsteil, []).append(i)
+                by_bezirk.setdefault(ortsteil.bezirk, []).append(i)
+        self._by_ortsteil = {k: np.unique(v) for k, v in by_ortsteil.items()}
+        self._by_bezirk = {k: np.unique(v) for k, v in by_bezirk.items()}
+
+    def _column(self, destination: str) -> int:
+        if destination not in self._destination_index:
+            raise ValueError(
+                f"Unknown destination {destination}. "
+                f"Choose one of {', '.join(self.destinations)}."
+            )
+        return self._destination_index[destination]
+
+    def _within(self, column: int, max_duration: int) -> np.ndarray:
+        """Indices of stations reaching a destination within max_duration (range query)"""
+        end = np.searchsorted(self._sorted[:, column], max_duration, side="right")
+        return self._order[:end, column]
+
+    def _limits(self, query: StationQuery) -> dict[int, int]:
+        """Max. duration by destination column"""
+        limits = {self._column(d): m for d, m in query.max_durations.items()}
+        if query.max_duration is not None:
+            for column in range(len(self.destinations)):
+                limits[column] = min(
+                    limits.get(column, query.max_duration), query.max_duration
+                )
+        return limits
+
+    def _mask(
+        self, candidates: np.ndarray, query: StationQuery, limits: dict[int, int]
+    ) -> np.ndarray:
+        """Which of the candidates match all constraints of the query"""
+        mask = np.ones(len(candidates), dtype=bool)
+        for column, max_duration in limits.items():
+            mask &= self.durations[candidates, column] <= max_duration
+        if query.max_average is not None:
+            mask &= self.average[candidates] <= query.max_average
+        if query.products is not None:
+            required = query.products.as_bitmask()
+            mask &= (self.products[candidates] & required) == required
+        if query.bezirk is not None:
+            mask &= np.isin(candidates, self._by_bezirk.get(query.bezirk, []))
+        if query.ortsteil is not None:
+            mask &= np.isin(candidates, self._by_ortsteil.get(query.ortsteil, []))
+        return mask
+
+    def _candidates(self, query: StationQuery) -> np.ndarray:
+        """Start with the most selective indexed constraint and filter the rest vectorized"""
+        limits = self._limits(query)
+        candidate_sets: list[np.ndarray] = []
+        if query.ortsteil is not None:
+            candidate_sets.append(
+                self._by_ortsteil.get(query.ortsteil, np.empty(0, np.intp))
+            )
+        if query.bezirk is not None:
+            candidate_sets.append(
+                self._by_bezirk.get(query.bezirk, np.empty(0, np.intp))
+            )
+        if query.max_duration is not None:
+            end = np.searchsorted(
+                self.worst[self._worst_order], query.max_duration, "right"
+            )
+            candidate_sets.append(self._worst_order[:end])
+        candidate_sets += [self._within(column, m) for column, m in limits.items()]
+
+        if not candidate_sets:
+            candidates = np.arange(len(self.stations))
+        else:
+            candidates = min(candidate_sets, key=len)
+        matching: np.ndarray = candidates[self._mask(candidates, query, limits)]
+        return matching
+
+    def _sort_key(self, sort_by: str) -> np.ndarray:
+        if sort_by == "worst":
+            return self.worst
+        if sort_by == "average":
+            return self.average
+        durations: np.ndarray = self.durations[:, self._column(sort_by)]
+        return durations
+
+    def query(self, query: StationQuery) -> list[QueryResult]:
+        """Return the matching stations sorted ascending, top-k if a limit is given"""
+        candidates = self._candidates(query)
+        keys = self._sort_key(query.sort_by)[candidates]
+        if query.limit is not None and query.limit < len(candidates):
+            top = np.argpartition(keys, query.limit)[: query.limit]
+            candidates, keys = candidates[top], keys[top]
+        candidates = candidates[np.argsort(keys, kind="stable")]
+        return [
+            QueryResult(
+                station=self.stations[i],
+                worst=_reached(self.worst[i]),
+                average=_reached(self.average[i]),
+                ortsteil=self.ortsteil_of[i],
+                bezirk=self.bezirk_of[i],
+            )
+            for i in candidates.tolist()
+        ]
+
+
+def _reached(duration: np.uint16) -> int | None:
+    return None if duration == NOT_REACHED else int(duration)
+
+
+def write_results(
+    results: Iterable[QueryResult], file: IO[str], output_format: Literal["csv", "json"]
+) -> None:
+    rows = [r.as_dict() for r in results]
+    if output_format == "json":
+        json.dump(rows, file, ensure_ascii=False, indent=2)
+        file.write("\n")
+    elif rows:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,203 @@
+"""Lazy route details for map popups. Instead of fetching journeys for all stations up front, the
+popups link to a small local server (serving the drawn map page as well), which fetches the quickest
+journey for a clicked station and destination through the cached and rate limited transport api
+and memoizes it, so detailed routes cost only what is actually clicked."""
+import functools
+import json
+import logging
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import parse_qs, urlparse
+
+from berlin_public_transport_reachability.entities import Destination, QueryOptions
+
+if TYPE_CHECKING:
+    from berlin_public_transport_reachability.journey_finder import Journey
+    from berlin_public_transport_reachability.station import Station
+
+logger = logging.getLogger(__name__)
+
+# one delegated handler per page, so the popups only carry a bare link per line; it takes the
+# station from the popup and the destination from the clicked line ("<destination>: 12 min").
+# It listens in the capture phase, as leaflet handles clicks within popups itself
+ROUTE_SCRIPT = """<script>
+document.addEventListener("click", event => {
+    const link = event.target.closest("a.route");
+    if (!link) return;
+    event.preventDefault();
+    const line = link.previousSibling.textContent;
+    const params = new URLSearchParams({
+        station: link.closest("[data-station]").dataset.station,
+        destination: line.slice(0, line.lastIndexOf(": ")),
+    });
+    let target = link.nextSibling;
+    if (!(target instanceof HTMLSpanElement)) {
+        target = document.createElement("span");
+        link.after(target);
+    }
+    target.textContent = " ...";
+    fetch("route?" + params)
+        .then(r => r.json().then(body => r.ok ? body : Promise.reject(body.error)))
+        .then(j => {
+            const lines = j.lines.length ? ` (${j.lines.join(", ")})` : "";
+            target.textContent = ` ${j.departure}-${j.arrival}, ${j.duration} min, ` +
+                `${j.transfers} transfers${lines}`;
+        })
+        .catch(error => {
+            target.textContent = typeof error === "string" ? ` ${error}` :
+                " Route details need the map server ('main.py --serve').";
+        });
+}, true);
+</script>
+"""
+
+
+# appended to each duration line of a popup tagged by get_route_popup
+ROUTE_LINK = '<a href="#" class="route">route</a>'
+
+
+def get_route_popup(station: str, popup: str) -> str:
+    """Tag a popup with its station once, for the route links of its lines"""
+    return f'<div data-station="{escape(station)}">{popup}</div>'
+
+
+class RouteResolver:
+    """Resolve the quickest journey from a destination to a station (the direction durations
+    are fetched in) at the configured time slot; results are memoized"""
+
+    def __init__(
+        self,
+        destinations: list[Destination],
+        stations: list["Station"],
+        options: QueryOptions,
+        cache_size: int = 1024,
+    ):
+        self.destinations = {d.name: d for d in destinations}
+        self.stations = {s.name: s for s in stations}
+        self.options = options
+        # failed lookups raise and are therefore not memoized
+        self.resolve = functools.lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, station: str, destination: str) -> "Journey":
+        # pylint: disable-next=import-outside-toplevel
+        from berlin_public_transport_reachability.coordinates_finder import Location
+
+        # pylint: disable-next=import-outside-toplevel
+        from berlin_public_transport_reachability.journey_finder import (
+            fetch_journeys,
+            parse_journey,
+        )
+
+        # pylint: disable-next=import-outside-toplevel
+        from berlin_public_transport_reachability.transport_api import get_when
+
+        if station not in self.stations:
+            raise ValueError(f"Unknown station {station}.")
+        if destination not in self.destinations:
+            raise ValueError(f"Unknown destination {destination}.")
+        latitude, longitude = self.stations[station].get_coordinates()
+        location = self.destinations[destination].location
+        when = get_when(self.options.time, self.options.provider.timezone)
+        logger.info(f"Getting route from {destination} to {station} at {when}.")
+        journeys = fetch_journeys(
+            Location(
+                address=destination,
+                latitude=str(location.latitude),
+                longitude=str(location.longitude),
+            ),
+            Location(address=station, latitude=str(latitude), longitude=str(longitude)),
+            provider=self.options.provider,
+            departure=when,
+            max_transfers=self.options.max_transfers,
+        )
+        return min((parse_journey(j) for j in journeys), key=lambda j: j.duration)
+
+
+def journey_to_json(journey: "Journey") -> dict[str, Any]:
+    return {
+        "origin": journey.origin_address,
+        "destination": journey.destination_address,
+        "departure": journey.departure.strftime("%H:%M"),
+        "arrival": journey.arrival.strftime("%H:%M"),
+        "duration": int(journey.duration.total_seconds() // 60),
+        "transfers": journey.count_stopvers,
+        "lines": journey.lines,
+    }
+
+
+class RouteServer(ThreadingHTTPServer):
+    """Serve the drawn map page (only that file, not its directory) and route details at
+    /route"""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], resolver: RouteResolver, page: Path):
+        super().__init__(address, _Handler)
+        self.resolver = resolver
+        self.page = page
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "RouteServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: RouteServer
+
+    def do_GET(self) -> None:  # noqa: N802  # pylint: disable=invalid-name
+        url = urlparse(self.path)
+        if url.path in ("/", f"/{self.server.page.name}"):
+            self._respond_page()
+            return
+        if url.path != "/route":
+            self._respond(404, {"error": "Not found."})
+            return
+
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        # pylint: disable-next=import-outside-toplevel
+        from requests import RequestException
+
+        try:
+            journey = self.server.resolver.resolve(
+                params.get("station", ""), params.get("destination", "")
+            )
+        except ValueError as error:
+            self._respond(404, {"error": str(error)})
+        except RequestException as error:
+            logger.warning(f"Route lookup failed: {error}")
+            self._respond(502, {"error": "Route lookup failed."})
+        else:
+            self._respond(200, journey_to_json(journey))
+
+    def _respond_page(self) -> None:
+        try:
+            content = self.server.page.read_bytes()
+        except FileNotFoundError:
+            self._respond(404, {"error": "The map has not been drawn."})
+            return
+        self._send(200, content, "text/html; charset=utf-8")
+
+    def _respond(self, status: int, body: Any) -> None:
+        self._send(status, json.dumps(body).encode(), "application/json")
+
+    def _send(self, status: int, content: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        logger.debug(format, *args)
@@ -1,3 +1,4 @@
+import functools
 import tomllib
 from pathlib import Path
 
@@ -10,11 +11,14 @@ class DestinationSettings(pydantic.BaseModel):
     destinations: list[str]
     time: TimeValue
     max_transfers: int
+    provider: str = "bvg"  # see providers.PROVIDERS
 
 
 class GeneralSettings(pydantic.BaseModel):
     max_duration: int
     circle_radius: int
+    workers: int = 1
+    streaming_html: bool = False
 
 
 class Settings(pydantic.BaseModel):
@@ -28,4 +32,7 @@ def parse_settings() -> Settings:
         return Settings.parse_obj(tomllib.load(file))
 
 
-settings = parse_settings()
+@functools.cache
+def get_settings() -> Settings:
+    """Parse settings.toml on first use and return the same instance afterwards"""
+    return parse_settings()
@@ -0,0 +1,147 @@
+"""Versioned binary snapshot of a complete run, i.e. the destinations and the reachable
+stations with their durations plus the parameters they were fetched with, stored as columnar
+numpy arrays in an uncompressed .npz file. Durations to destinations a station was not found for
+are stored as NOT_REACHED; their placeholders are filled in on load with the current
+max. duration, like in a fresh run."""
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from berlin_public_transport_reachability.entities import (
+    Destination,
+    DestinationLocation,
+    DestinationProducts,
+)
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.station import Station
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 3
+NOT_REACHED = np.iinfo(np.uint16).max
+
+
+@dataclass(frozen=True)
+class SnapshotParameters:
+    """Parameters the stations of a snapshot were fetched and filtered with"""
+
+    max_duration: int
+    time: TimeValue
+    provider: str
+    max_transfers: int
+
+
+def save_snapshot(
+    path: Path,
+    destinations: list[Destination],
+    stations: list[Station],
+    parameters: SnapshotParameters,
+) -> None:
+    """Save destinations and stations (incl. durations to each destination) to path"""
+    destination_names = [d.name for d in destinations]
+    durations = np.array(
+        [
+            [
+                NOT_REACHED if name in s.not_found else s.durations[name]
+                for name in destination_names
+            ]
+            for s in stations
+        ],
+        dtype=np.uint16,
+    ).reshape(len(stations), len(destinations))
+    with path.open("wb") as file:
+        np.savez(
+            file,
+            version=np.array(SNAPSHOT_VERSION, dtype=np.uint16),
+            max_duration=np.array(parameters.max_duration, dtype=np.uint16),
+            time=np.array(parameters.time.value, dtype=np.str_),
+            provider=np.array(parameters.provider, dtype=np.str_),
+            max_transfers=np.array(parameters.max_transfers, dtype=np.uint8),
+            destination_names=np.array(destination_names, dtype=np.str_),
+            destination_coordinates=np.array(
+                [d.coordinates for d in destinations], dtype=np.float64
+            ).reshape(len(destinations), 2),
+            destination_products=np.array(
+                [d.products.as_bitmask() for d in destinations], dtype=np.uint8
+            ),
+            station_names=np.array([s.name for s in stations], dtype=np.str_),
+            station_coordinates=np.array(
+                [s.coordinates for s in stations], dtype=np.float64
+            ).reshape(len(stations), 2),
+            station_products=np.array(
+                [s.products.as_bitmask() for s in stations], dtype=np.uint8
+            ),
+            durations=durations,
+        )
+    logger.info(
+        f"Saved snapshot with {len(destinations)} destinations and {len(stations)} "
+        f"stations to {path}."
+    )
+
+
+def load_snapshot(
+    path: Path, max_duration: int | None = None
+) -> tuple[list[Destination], list[Station], SnapshotParameters]:
+    """Load destinations, stations and parameters from a snapshot written by save_snapshot.
+    Placeholders for destinations a station was not found for are filled in and stations are
+    filtered with max_duration, defaulting to the snapshot's."""
+    with np.load(path, allow_pickle=False) as npz:
+        data = {name: npz[name] for name in npz.files}
+    if (version := int(data["version"])) != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Unsupported snapshot version {version}, expected {SNAPSHOT_VERSION}."
+        )
+    parameters = SnapshotParameters(
+        max_duration=int(data["max_duration"]),
+        time=TimeValue(str(data["time"])),
+        provider=str(data["provider"]),
+        max_transfers=int(data["max_transfers"]),
+    )
+    destination_names: list[str] = data["destination_names"].tolist()
+    destinations = [
+        Destination(
+            name=name,
+            location=DestinationLocation(latitude=latitude, longitude=longitude),
+            products=DestinationProducts.from_bitmask(products),
+        )
+        for name, (latitude, longitude), products in zip(
+            destination_names,
+            data["destination_coordinates"].tolist(),
+            data["destination_products"].tolist(),
+            strict=True,
+        )
+    ]
+
+    effective_max_duration = max_duration or parameters.max_duration
+    stations: list[Station] = []
+    for name, (latitude, longitude), products, durations in zip(
+        data["station_names"].tolist(),
+        data["station_coordinates"].tolist(),
+        data["station_products"].tolist(),
+        data["durations"].tolist(),
+        strict=True,
+    ):
+        station = Station(
+            name=name,
+            coordinates=(latitude, longitude),
+            products=DestinationProducts.from_bitmask(products),
+        )
+        for destination, duration in zip(destination_names, durations, strict=True):
+            if duration != NOT_REACHED:
+                station.add_duration(destination, duration)
+        station.fill_durations_not_found(destination_names, effective_max_duration)
+        if station.get_weighted_duration() <= effective_max_duration:
+            stations.append(station)
+    logger.info(
+        f"Loaded snapshot with {len(stations)} stations within {effective_max_duration} min "
+        f"from {path}."
+    )
+
+    if effective_max_duration > parameters.max_duration:
+        logger.warning(
+            f"Snapshot was filtered with a max. duration of {parameters.max_duration} min, "
+            f"so stations up to {effective_max_duration} min are missing."
+        )
+    return destinations, stations, parameters
@@ -1,7 +1,11 @@
 from typing import Any
 
-from berlin_public_transport_reachability.entities import DestinationProducts, color_map
-from berlin_public_transport_reachability.settings import settings
+from berlin_public_transport_reachability.entities import (
+    DestinationProducts,
+    get_color_map,
+)
+from berlin_public_transport_reachability.routes import ROUTE_LINK, get_route_popup
+from berlin_public_transport_reachability.settings import get_settings
 
 
 class Station:
@@ -14,6 +18,8 @@ class Station:
         self.coordinates = coordinates
         self.products: DestinationProducts = products
         self.durations: dict[str, int] = {}
+        # destinations the station was not found for, whose durations are placeholders
+        self.not_found: set[str] = set()
 
     def get_coordinates(self, *, latitude_first: bool = True) -> tuple[float, float]:
         """Return the coordinates of the station"""
@@ -29,25 +35,43 @@ class Station:
     def get_color(self) -> Any:
         """Return a color based on the duration to the station as hex string"""
         duration = self.get_weighted_duration()
-        return color_map[duration - 1].get_hex()
+        return get_color_map()[duration - 1].get_hex()
 
-    def get_popup_text(self) -> str:
-        """Return a string with the station name and durations to destinations in pseudo-html"""
+    def get_popup_text(self, *, routes: bool = False) -> str:
+        """Return a string with the station name and durations to destinations in pseudo-html,
+        with routes each with a link to load the route on demand (from the route server)
+        """
         popup = f"{self.name}<br>{','.join(self.products.as_list())}<br><br>"
         for key, value in self.durations.items():
-            popup += f"{key}: {value} min<br>"
+            popup += f"{key}: {value} min"
+            popup += f" {ROUTE_LINK}<br>" if routes else "<br>"
         popup += f"Average: {self.get_weighted_duration()} min"
-        return popup
+        return get_route_popup(self.name, popup) if routes else popup
 
-    def add_duration_not_found(self, destination: str) -> None:
+    def add_duration_not_found(
+        self, destination: str, max_duration: int | None = None
+    ) -> None:
         """Add a duration of MAX_DURATION*2 to a specific destination to the station that was
-        not found.
+        not found; max_duration defaults to the configured one.
         However, there seems to be a bug with some central bus stations not being found; we add
         average current duration there"""
         if len(self.durations) >= 1 and self.get_weighted_duration() < 20:
             self.durations[destination] = self.get_weighted_duration()
         else:
-            self.durations[destination] = settings.general.max_duration * 2
+            self.durations[destination] = (
+                max_duration or get_settings().general.max_duration
+            ) * 2
+        self.not_found.add(destination)
+
+    def fill_durations_not_found(
+        self, destinations: list[str], max_duration: int
+    ) -> None:
+        """Add a placeholder duration (see add_duration_not_found) for each destination the
+        station was not found for and order the durations like the destinations"""
+        for destination in destinations:
+            if destination not in self.durations:
+                self.add_duration_not_found(destination, max_duration)
+        self.durations = {d: self.durations[d] for d in destinations}
 
     def add_duration(self, destination: str, duration: int) -> None:
         """Add a duration to a specific destination to the station"""
@@ -0,0 +1,259 @@
+"""Precomputed stop x stop travel-time matrix for one time slot. Built offline by sweeping
+/stops/reachable-from over all stops (bounded concurrency, resumable), stored as a memory-mapped
+uint8 array with one row per origin stop plus a stop index. Destination sets lying on stops are
+then answered by reading their rows, without any request."""
+import functools
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
+
+import numpy as np
+
+from berlin_public_transport_reachability.entities import (
+    Destination,
+    DestinationLocation,
+    DestinationProducts,
+    QueryOptions,
+)
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.station import Station
+
+if TYPE_CHECKING:
+    from berlin_public_transport_reachability.transport_api import BerlinTransportApi
+
+logger = logging.getLogger(__name__)
+
+MATRIX_VERSION = 1
+NOT_REACHED = (
+    255  # durations are stored in minutes, so the horizon must stay below this
+)
+CHECKPOINT_EVERY = 100  # rows
+
+
+class StopMatrix:
+    """Durations from each origin stop (row) to each stop (column) within the horizon"""
+
+    def __init__(self, path: Path, mode: Literal["r", "r+"] = "r"):
+        self.path = path
+        self.metadata = json.loads(
+            path.joinpath("metadata.json").read_text(encoding="utf-8")
+        )
+        if self.metadata["version"] != MATRIX_VERSION:
+            raise ValueError(
+                f"Unsupported matrix version {self.metadata['version']}, "
+                f"expected {MATRIX_VERSION}."
+            )
+        with np.load(path.joinpath("stops.npz")) as stops:
+            self.names: list[str] = stops["names"].tolist()
+            self.coordinates: np.ndarray = stops["coordinates"]
+            self.products: np.ndarray = stops["products"]
+        self.done: np.ndarray = np.load(path.joinpath("done.npy"))
+        self.matrix = np.memmap(
+            path.joinpath("matrix.u8"),
+            dtype=np.uint8,
+            mode=mode,
+            shape=(len(self.names), len(self.names)),
+        )
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    @property
+    def time(self) -> TimeValue:
+        return TimeValue(self.metadata["time"])
+
+    @property
+    def horizon(self) -> int:
+        return int(self.metadata["horizon"])
+
+    def mismatches(self, options: QueryOptions, max_duration: int) -> list[str]:
+        """The parameters keeping the matrix from answering queries with these options, each
+        with the matrix's and the query's value"""
+        parameters = {
+            "provider": (self.metadata["provider"], options.provider.name),
+            "time slot": (self.time.value, options.time.value),
+            "transfers": (self.metadata["max_transfers"], options.max_transfers),
+            "products": (
+                ",".join(
+                    DestinationProducts.from_bitmask(
+                        self.metadata["products"]
+                    ).as_list()
+                ),
+                ",".join(options.products.as_list()),
+            ),
+        }
+        mismatches = [
+            f"{name} (matrix: {built}, query: {queried})"
+            for name, (built, queried) in parameters.items()
+            if built != queried
+        ]
+        if max_duration > self.horizon:
+            mismatches.append(
+                f"horizon (matrix: {self.horizon} min, query: {max_duration} min)"
+            )
+        return mismatches
+
+    def index_of(self, name: str) -> int | None:
+        return self._index.get(name)
+
+    def find(self, name: str) -> int | None:
+        """Index of the completely swept stop with exactly this name"""
+        i = self._index.get(name)
+        return i if i is not None and self.done[i] else None
+
+    def get_destination(self, i: int) -> Destination:
+        latitude, longitude = self.coordinates[i].tolist()
+        return Destination(
+            name=self.names[i],
+            location=DestinationLocation(latitude=latitude, longitude=longitude),
+            products=DestinationProducts.from_bitmask(int(self.products[i])),
+        )
+
+    def durations(self, origins: list[int]) -> np.ndarray:
+        """origins x stops durations (NOT_REACHED if beyond the horizon)"""
+        return np.asarray(self.matrix[origins])
+
+    def get_stations(self, rows: dict[str, int], max_duration: int) -> list[Station]:
+        """Stations reachable within max_duration from any of the destinations' rows, with
+        their durations to the destinations they are reachable from"""
+        durations = self.durations(list(rows.values()))
+        reached = np.flatnonzero((durations <= max_duration).any(axis=0))
+        # products are shared by all stations with the same bitmask
+        bitmasks = self.products[reached].tolist()
+        products = {b: DestinationProducts.from_bitmask(b) for b in set(bitmasks)}
+        stations: list[Station] = []
+        for j, (latitude, longitude), bitmask, column in zip(
+            reached.tolist(),
+            self.coordinates[reached].tolist(),
+            bitmasks,
+            durations[:, reached].T.tolist(),
+            strict=True,
+        ):
+            station = Station(
+                name=self.names[j],
+                coordinates=(latitude, longitude),
+                products=products[bitmask],
+            )
+            for destination, duration in zip(rows, column, strict=True):
+                if duration <= max_duration:
+                    station.add_duration(destination, duration)
+            stations.append(station)
+        return stations
+
+
+def _create(
+    path: Path, stops: list[Destination], options: QueryOptions, horizon: int
+) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+    with path.joinpath("stops.npz").open("wb") as file:
+        np.savez(
+            file,
+            names=np.array([s.name for s in stops], dtype=np.str_),
+            coordinates=np.array(
+                [s.coordinates for s in stops], dtype=np.float64
+            ).reshape(len(stops), 2),
+            products=np.array([s.products.as_bitmask() for s in stops], dtype=np.uint8),
+        )
+    matrix = np.memmap(
+        path.joinpath("matrix.u8"),
+        dtype=np.uint8,
+        mode="w+",
+        shape=(len(stops), len(stops)),
+    )
+    matrix[:] = NOT_REACHED
+    matrix.flush()
+    np.save(path.joinpath("done.npy"), np.zeros(len(stops), dtype=bool))
+    metadata = {
+        "version": MATRIX_VERSION,
+        "provider": options.provider.name,
+        "time": options.time.value,
+        "max_transfers": options.max_transfers,
+        "products": options.products.as_bitmask(),
+        "horizon": horizon,
+    }
+    path.joinpath("metadata.json").write_text(
+        json.dumps(metadata, indent=2), encoding="utf-8"
+    )
+
+
+def _collect_stops(api: "BerlinTransportApi", seeds: list[str]) -> list[Destination]:
+    """The seeds and the stops reachable from them within the api's max. duration"""
+    stops: dict[str, Destination] = {}
+    for seed in seeds:
+        seed_destination = api.get_destination(seed)
+        stops.setdefault(seed_destination.name, seed_destination)
+        for reachable in api.get_reachable_stops_from(seed_destination):
+            for stop in reachable.stations:
+                stops.setdefault(stop.name, stop)
+    return list(stops.values())
+
+
+def _sweep_row(
+    api: "BerlinTransportApi", stop_matrix: StopMatrix, i: int
+) -> tuple[np.ndarray, int]:
+    """Row i of the matrix and the number of reachable stops missing from the stop index"""
+    row = np.full(len(stop_matrix.names), NOT_REACHED, dtype=np.uint8)
+    unknown = 0
+    for reachable in api.get_reachable_stops_from(stop_matrix.get_destination(i)):
+        for stop in reachable.stations:
+            if (j := stop_matrix.index_of(stop.name)) is None:
+                unknown += 1
+            else:
+                row[j] = min(row[j], reachable.duration)
+    return row, unknown
+
+
+def build_stop_matrix(
+    path: Path,
+    seeds: list[str],
+    options: QueryOptions,
+    horizon: int,
+    concurrency: int = 4,
+) -> StopMatrix:
+    """Build the matrix or resume an interrupted build. The stop index is the union of the stops
+    reachable from the seeds within the horizon (e.g. a central stop and a large horizon).
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from berlin_public_transport_reachability.transport_api import BerlinTransportApi
+
+    if horizon >= NOT_REACHED:
+        raise ValueError(f"Horizon must be below {NOT_REACHED} min.")
+    api = BerlinTransportApi(max_duration=horizon, options=options)
+    if not path.joinpath("metadata.json").exists():
+        stops = _collect_stops(api, seeds)
+        _create(path, stops, options, horizon)
+        logger.info(f"Created stop matrix with {len(stops)} stops in {path}.")
+
+    stop_matrix = StopMatrix(path, mode="r+")
+    if mismatches := stop_matrix.mismatches(options, horizon):
+        raise ValueError(
+            f"Existing stop matrix in {path} was built with other parameters: "
+            f"{', '.join(mismatches)}."
+        )
+    pending = np.flatnonzero(~stop_matrix.done).tolist()
+    logger.info(f"Sweeping {len(pending)} of {len(stop_matrix.names)} stops.")
+
+    unknown_total = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for start in range(0, len(pending), CHECKPOINT_EVERY):
+            batch = pending[start : start + CHECKPOINT_EVERY]
+            for i, (row, unknown) in zip(
+                batch,
+                executor.map(functools.partial(_sweep_row, api, stop_matrix), batch),
+                strict=True,
+            ):
+                stop_matrix.matrix[i] = row
+                stop_matrix.done[i] = True
+                unknown_total += unknown
+            # rows first, so a row marked done is always on disk
+            stop_matrix.matrix.flush()
+            np.save(path.joinpath("done.npy"), stop_matrix.done)
+            logger.info(
+                f"Checkpoint: {min(start + CHECKPOINT_EVERY, len(pending))} of "
+                f"{len(pending)} stops swept."
+            )
+    if unknown_total:
+        logger.info(
+            f"Ignored {unknown_total} reachable stops missing from the stop index."
+        )
+    return stop_matrix
@@ -0,0 +1,323 @@
+"""Local stand-in for a transport.rest api (/locations, /stops/reachable-from, /journeys) for
+load and throughput tests. Responses are replayed from a cache export ('main.py cache export')
+or generated synthetically; latency, 429/5xx errors and response sizes are configurable."""
+import datetime
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+from berlin_public_transport_reachability.providers import PRODUCTS
+
+logger = logging.getLogger(__name__)
+
+# Berlin bounding box
+LATITUDES = (52.34, 52.68)
+LONGITUDES = (13.09, 13.76)
+MINUTES_PER_KM = 3
+
+
+@dataclass
+class Latency:
+    """Latency distribution, parsed from 'const:ms', 'uniform:min_ms:max_ms' or
+    'lognormal:median_ms:sigma'"""
+
+    kind: str = "const"
+    a: float = 0
+    b: float = 0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, *values = spec.split(":")
+        if kind not in {"const", "uniform", "lognormal"}:
+            raise ValueError(f"Invalid latency {spec}.")
+        return cls(kind, *(float(v) for v in values))
+
+    def sample(self, rnd: random.Random) -> float:
+        """Return a latency in seconds"""
+        if self.kind == "uniform":
+            return rnd.uniform(self.a, self.b) / 1000
+        if self.kind == "lognormal":
+            return rnd.lognormvariate(math.log(max(self.a, 0.001)), self.b) / 1000
+        return self.a / 1000
+
+
+@dataclass
+class StubConfig:
+    latency: Latency = field(default_factory=Latency)
+    rate_429: float = 0.0  # share of requests answered with 429 Too Many Requests
+    rate_5xx: float = 0.0  # share of requests answered with 503 Service Unavailable
+    retry_after: int = 0  # seconds, sent with 429
+    count_stations: int = (
+        3000  # synthetic stations, i.e. max. size of reachable-from responses
+    )
+    recorded: Path | None = None  # json lines as written by cache.export
+    seed: int = 0
+
+
+def _point(name: str) -> tuple[float, float]:
+    """Deterministic pseudo-random coordinates for a name"""
+    digest = hashlib.sha256(name.encode()).digest()
+    latitude = LATITUDES[0] + (LATITUDES[1] - LATITUDES[0]) * digest[0] / 255
+    longitude = LONGITUDES[0] + (LONGITUDES[1] - LONGITUDES[0]) * digest[1] / 255
+    return latitude, longitude
+
+
+def _distance_km(a: tuple[float, float], b: tuple[float, float]) -> float:
+    dy = (a[0] - b[0]) * 111.2
+    dx = (a[1] - b[1]) * 111.2 * math.cos(math.radians(a[0]))
+    return math.hypot(dx, dy)
+
+
+class SyntheticData:
+    """Synthetic stops with random products; travel time grows linearly with the distance"""
+
+    def __init__(self, count_stations: int, seed: int):
+        rnd = random.Random(seed)
+        self.stops: list[dict[str, Any]] = []
+        for i in range(count_stations):
+            products = {p: rnd.random() < 0.3 for p in PRODUCTS}
+            products["bus"] = products["bus"] or not any(products.values())
+            self.stops.append(
+                {
+                    "type": "stop",
+                    "id": str(900000000 + i),
+                    "name": f"Stop {i}",
+                    "location": {
+                        "type": "location",
+                        "latitude": rnd.uniform(*LATITUDES),
+                        "longitude": rnd.uniform(*LONGITUDES),
+                    },
+                    "products": products,
+                    "offset": rnd.randint(0, 6),  # waiting/walking time
+                }
+            )
+
+    @staticmethod
+    def locations(query: str) -> list[dict[str, Any]]:
+        latitude, longitude = _point(query)
+        return [
+            {
+                "type": "stop",
+                "id": "900000000",
+                "name": query,
+                "location": {
+                    "type": "location",
+                    "latitude": latitude,
+                    "longitude": longitude,
+                },
+                "products": {p: True for p in PRODUCTS},
+            }
+        ]
+
+    def reachable_from(self, params: dict[str, str]) -> list[dict[str, Any]]:
+        origin = (float(params["latitude"]), float(params["longitude"]))
+        max_duration = int(params.get("maxDuration", 20))
+        allowed = {p for p in PRODUCTS if params.get(p, "true").lower() == "true"}
+        by_duration: dict[int, list[dict[str, Any]]] = {}
+        for stop in self.stops:
+            if not allowed & {p for p, v in stop["products"].items() if v}:
+                continue
+            location = stop["location"]
+            distance = _distance_km(
+                origin, (location["latitude"], location["longitude"])
+            )
+            duration = 1 + int(distance * MINUTES_PER_KM) + stop["offset"]
+            if duration <= max_duration:
+                by_duration.setdefault(duration, []).append(
+                    {k: v for k, v in stop.items() if k != "offset"}
+                )
+        return [{"duration": d, "stations": s} for d, s in sorted(by_duration.items())]
+
+    def journeys(self, params: dict[str, str]) -> dict[str, Any]:
+        origin = (float(params["from.latitude"]), float(params["from.longitude"]))
+        destination = (float(params["to.latitude"]), float(params["to.longitude"]))
+        departure = datetime.datetime.now(tz=datetime.UTC).replace(microsecond=0)
+        duration = 5 + int(_distance_km(origin, destination) * MINUTES_PER_KM)
+        transfer = departure + datetime.timedelta(minutes=duration // 2)
+        arrival = departure + datetime.timedelta(minutes=duration)
+        stop = {"type": "stop", "name": "Stop 0", "products": self.stops[0]["products"]}
+        return {
+            "journeys": [
+                {
+                    "legs": [
+                        {
+                            "origin": {
+                                **stop,
+                                "name": params.get("from.address", "Origin"),
+                            },
+                            "destination": stop,
+                            "departure": departure.isoformat(),
+                            "arrival": transfer.isoformat(),
+                        },
+                        {
+                            "origin": stop,
+                            "destination": {
+                                **stop,
+                                "name": params.get("to.address", "Destination"),
+                            },
+                            "departure": transfer.isoformat(),
+                            "arrival": arrival.isoformat(),
+                        },
+                    ]
+                }
+            ]
+        }
+
+
+def _recorded_key(endpoint: str, params: dict[str, str]) -> str:
+    # the time slot moves every week, so it is ignored for matching
+    return (
+        endpoint
+        + "?"
+        + "&".join(f"{k}={v}" for k, v in sorted(params.items()) if k != "when")
+    )
+
+
+def load_recorded(path: Path) -> dict[str, Any]:
+    """Load the bodies of a cache export, keyed by endpoint and parameters"""
+    recorded: dict[str, Any] = {}
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            url = urlparse(record["url"])
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            recorded[_recorded_key(url.path, params)] = record["body"]
+    return recorded
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: StubConfig):
+        super().__init__(address, _Handler)
+        self.config = config
+        self.data = SyntheticData(config.count_stations, config.seed)
+        self.recorded = load_recorded(config.recorded) if config.recorded else {}
+        self.requests: Counter[str] = Counter()  # by endpoint and status
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def draw(self) -> tuple[float, float]:
+        """Return a latency and a random number for error injection (thread-safe)"""
+        with self._lock:
+            return self.config.latency.sample(self._random), self._random.random()
+
+    def count(self, endpoint: str, status: int) -> None:
+        with self._lock:
+            self.requests[f"{endpoint} {status}"] += 1
+
+    def start(self) -> "StubServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def do_GET(self) -> None:  # noqa: N802  # pylint: disable=invalid-name
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        latency, chance = self.server.draw()
+        time.sleep(latency)
+
+        config = self.server.config
+        if chance < config.rate_429:
+            self._respond(url.path, 429, {"message": "too many requests"})
+            return
+        if chance < config.rate_429 + config.rate_5xx:
+            self._respond(url.path, 503, {"message": "service unavailable"})
+            return
+
+        key = _recorded_key(url.path, params)
+        if key in self.server.recorded:
+            body = self.server.recorded[key]
+        elif url.path == "/locations":
+            body = self.server.data.locations(params.get("query", ""))
+        elif url.path == "/stops/reachable-from":
+            body = self.server.data.reachable_from(params)
+        elif url.path == "/journeys":
+            body = self.server.data.journeys(params)
+        else:
+            self._respond(url.path, 404, {"message": "not found"})
+            return
+        self._respond(url.path, 200, body)
+
+    def _respond(self, endpoint: str, status: int, body: Any) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if status == 429 and self.server.config.retry_after:
+            self.send_header("Retry-After", str(self.server.config.retry_after))
+        self.end_headers()
+        # count before answering, so clients see the count of their finished requests
+        self.server.count(endpoint, status)
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        logger.debug(format, *args)
+
+
+def add_stub_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--latency",
+        help="'const:ms', 'uniform:min_ms:max_ms' or 'lognormal:median_ms:sigma'",
+        default="const:0",
+    )
+    parser.add_argument(
+        "--rate-429", help="Share of 429 responses", type=float, default=0
+    )
+    parser.add_argument(
+        "--rate-5xx", help="Share of 503 responses", type=float, default=0
+    )
+    parser.add_argument(
+        "--retry-after", help="Retry-After for 429 in s", type=int, default=0
+    )
+    parser.add_argument(
+        "--stations", help="Number of synthetic stations", type=int, default=3000
+    )
+    parser.add_argument(
+        "--recorded", help="Cache export (json lines) to replay", type=Path
+    )
+
+
+def stub_config_from_args(args: Any) -> StubConfig:
+    return StubConfig(
+        latency=Latency.parse(args.latency),
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        count_stations=args.stations,
+        recorded=args.recorded,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser_ = ArgumentParser(description=__doc__)
+    parser_.add_argument("--port", type=int, default=8000)
+    add_stub_arguments(parser_)
+    args_ = parser_.parse_args()
+    server = StubServer(("127.0.0.1", args_.port), stub_config_from_args(args_))
+    logger.info(f"Serving stub transport api at {server.base_url}")
+    server.serve_forever()
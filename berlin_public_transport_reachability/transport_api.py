@@ -1,14 +1,21 @@
 import datetime
+import functools
 import logging
+import threading
+from typing import Any
 
 import pytz
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from berlin_public_transport_reachability.entities import (
     Destination,
+    QueryOptions,
     ReachableInMinutes,
 )
 from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.providers import Provider
 
 logger = logging.getLogger(__name__)
 
@@ -19,98 +26,167 @@ logger = logging.getLogger(__name__)
 #        'address=S%2BU+Alexanderplatz&maxDuration=50&suburban=True&subway=True&tram=True&bus=True&'
 #        'ferry=False&express=False&regional=False')
 
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the session shared by all providers and threads. It is created on first use, i.e.
+    after the response cache has been installed, so it is a cached session if there is one.
+    Rate limited (429) and unavailable (5xx) responses are retried with backoff; this happens
+    below the cache, so offline cache misses still fail immediately."""
+    # the first call may come from several threads at once
+    with _session_lock:
+        return _create_session()
+
+
+@functools.cache
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get(
+    provider: Provider, url: str, params: dict[str, int | float | str | bool]
+) -> requests.Response:
+    """Send a GET request through the shared session, obeying the provider's rate limit for
+    requests that can't be answered from the cache. Fails fast on errors, including misses in
+    offline mode, where the cache answers with 504 (Not Cached)."""
+    session = get_session()
+    cache = getattr(session, "cache", None)
+    request = requests.Request("GET", url, params=params)
+    if cache is None or not cache.contains(request=session.prepare_request(request)):
+        provider.rate_limiter.wait()
+    response = session.get(url, params=params, timeout=15)
+    response.raise_for_status()
+    return response
+
+
+# weekday (0 = Monday, 6 = Sunday) and local time of each time slot
+TIME_SLOTS: dict[TimeValue, tuple[int, datetime.time]] = {
+    TimeValue.NEXT_WORKDAY_NOON: (0, datetime.time(12, 0)),
+    TimeValue.NEXT_SUNDAY_EARLY_MORNING: (6, datetime.time(4, 0)),
+}
+
+
+def get_when(time: TimeValue, timezone: str) -> str:
+    """Get the next occurrence of the time slot in the timezone in iso format"""
+    if time not in TIME_SLOTS:
+        raise ValueError(f"Invalid time: {time}")
+    weekday, local_time = TIME_SLOTS[time]
+    tz = pytz.timezone(timezone)
+    today = datetime.datetime.now(tz=tz).date()
+    days_ahead = weekday - today.weekday()
+    if days_ahead <= 0:  # Target day already happened this week
+        days_ahead += 7
+    date = today + datetime.timedelta(days_ahead)
+    # pytz timezones must be applied via localize, not via tzinfo (which yields LMT)
+    return tz.localize(datetime.datetime.combine(date, local_time)).isoformat()
+
+
+def get_time_slot(when: str) -> TimeValue | None:
+    """Get the time slot of an iso timestamp as created by get_when, if any"""
+    local = datetime.datetime.fromisoformat(when)
+    return next(
+        (
+            time
+            for time, (weekday, local_time) in TIME_SLOTS.items()
+            if local.weekday() == weekday and local.time() == local_time
+        ),
+        None,
+    )
+
 
 class BerlinTransportApi:
-    """Fetch Berlin Public Transport data"""
-
-    def __init__(
-        self,
-        max_duration: int,
-        time: TimeValue,
-        max_transfers: int,
-    ):
-        self.base_url = "https://v5.bvg.transport.rest"
+    """Fetch public transport data from a transport.rest provider (BVG by default)"""
+
+    def __init__(self, max_duration: int, options: QueryOptions):
+        self.provider = options.provider
+        self.products = options.products
+        self.base_url = options.provider.base_url
         self.max_duration = max_duration
-        self.time = time
-        self.max_transfers = max_transfers
+        self.time = options.time
+        self.max_transfers = options.max_transfers
+
+    def _get(
+        self, url: str, params: dict[str, int | float | str | bool]
+    ) -> requests.Response:
+        return get(self.provider, url, params=params)
+
+    def _convert_products(self, stop: dict[str, Any]) -> dict[str, Any]:
+        """Replace the provider's product flags of a stop by ours"""
+        return {
+            **stop,
+            "products": self.provider.products_from_response(stop["products"]),
+        }
 
     def get_destination(self, query: str) -> Destination:
         """Get destination by query via location api"""
         url = self.base_url + "/locations"
-        params: dict[str, str | int] = {
+        params: dict[str, int | float | str | bool] = {
             "query": query,
             "results": 1,
         }
-        response = requests.get(url, params=params, timeout=15)
+        response = self._get(url, params=params)
         destination_ = response.json()[0]
         if query.lower() not in destination_["name"].lower():
             raise ValueError(
                 f"Location not found. Found {destination_['name']} instead of {query}."
             )
-        return Destination(**destination_)
-
-    @staticmethod
-    def _next_weekday(weekday: int) -> datetime.date:
-        """Get next weekday (0 = Monday, 6 = Sunday)"""
-        today = datetime.datetime.now(tz=pytz.timezone("Europe/Berlin")).date()
-        days_ahead = weekday - today.weekday()
-        if days_ahead <= 0:  # Target day already happened this week
-            days_ahead += 7
-        return today + datetime.timedelta(days_ahead)
-
-    def _next_workday_noon_as_iso(self) -> str:
-        """Get next workday at noon in iso format"""
-        next_workday = self._next_weekday(weekday=0)
-        noon = datetime.time(12, 0, 0, 0, tzinfo=pytz.timezone("Europe/Berlin"))
-        next_workday_noon = datetime.datetime.combine(next_workday, noon)
-        return next_workday_noon.isoformat()
-
-    def _next_sunday_early_morning_as_iso(self) -> str:
-        """Get next sunday early morning in iso format"""
-        next_sunday = self._next_weekday(weekday=6)
-        early_morning = datetime.time(4, 0, 0, 0, tzinfo=pytz.timezone("Europe/Berlin"))
-        next_sunday_early_morning = datetime.datetime.combine(
-            next_sunday, early_morning
-        )
-        return next_sunday_early_morning.isoformat()
+        return Destination(**self._convert_products(destination_))
+
+    def get_when(self) -> str:
+        """Get the instance's time slot in iso format"""
+        return get_when(self.time, self.provider.timezone)
 
     def get_reachable_stops_from(
         self, destination: Destination
     ) -> list[ReachableInMinutes]:
         """Get reachable stops for supplied destination within certain duration"""
-        logger.info(f"Getting reachable stops for {destination.name} at {self.time}.")
-
-        if self.time == TimeValue.NEXT_SUNDAY_EARLY_MORNING:
-            when = self._next_sunday_early_morning_as_iso()
-        elif self.time == TimeValue.NEXT_WORKDAY_NOON:
-            when = self._next_workday_noon_as_iso()
-        else:
-            raise ValueError(f"Invalid time: {self.time}")
+        logger.info(
+            f"Getting reachable stops for {destination.name} at {self.time} "
+            f"from {self.provider.name}."
+        )
 
+        when = self.get_when()
         url = self.base_url + "/stops/reachable-from"
         params: dict[str, int | float | str | bool] = {
             "latitude": destination.location.latitude,
             "longitude": destination.location.longitude,
             "address": destination.name,
             "when": when,
-            "maxTransfers": 3,
+            "maxTransfers": self.max_transfers,
             "maxDuration": self.max_duration,
-            "suburban": True,  # S-Bahn
-            "subway": True,  # U-Bahn
-            "tram": True,  # Tram
-            "bus": True,  # Bus
-            "ferry": False,  # Ferry
-            "express": False,  # ICE/IC
-            "regional": False,  # RE/RB
+            **self.provider.products_to_params(self.products.dict()),
         }
 
-        response = requests.get(url, params=params, timeout=15)
+        response = self._get(url, params=params)
         reachable_stops = response.json()
+        count_stops = len(
+            [station for r in reachable_stops for station in r["stations"]]
+        )
 
         logger.info(
-            f"Found {len([station for r in reachable_stops for station in r['stations']])}"
-            f" non-distinct "
+            f"Found {count_stops} non-distinct "
             f"reachable stations from {destination.name} at {when} with duration "
             f"up to {self.max_duration} min."
         )
-        return [ReachableInMinutes(**r) for r in reachable_stops]
+        return [
+            ReachableInMinutes(
+                duration=r["duration"],
+                stations=[
+                    Destination(**self._convert_products(s)) for s in r["stations"]
+                ],
+            )
+            for r in reachable_stops
+        ]
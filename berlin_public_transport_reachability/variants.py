@@ -0,0 +1,206 @@
+"""Reachability variants: the same destinations queried with different product masks and
+transfer limits. Each variant is identified by a bitmask (products in the low 7 bits, max.
+transfers above), only requested variants are fetched (concurrently), and all of them share one
+station index with a compact duration matrix per variant."""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from berlin_public_transport_reachability.entities import (
+    Destination,
+    DestinationProducts,
+    QueryOptions,
+    ReachableInMinutes,
+)
+from berlin_public_transport_reachability.station import Station
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_BITS = 7
+NOT_REACHED = np.iinfo(np.uint16).max
+
+PRODUCT_PRESETS: dict[str, DestinationProducts] = {
+    "default": DestinationProducts.from_bitmask(0b0001111),  # S, U, Tram, Bus
+    "no_bus": DestinationProducts.from_bitmask(0b0000111),  # S, U, Tram
+    "rail_only": DestinationProducts.from_bitmask(0b0000011),  # S, U
+    "with_regional": DestinationProducts.from_bitmask(
+        0b1101111
+    ),  # S, U, Tram, Bus, RE, RB
+}
+
+
+@dataclass(frozen=True)
+class Variant:
+    products: DestinationProducts
+    max_transfers: int
+    name: str = field(default="", compare=False)
+
+    @property
+    def key(self) -> int:
+        return self.products.as_bitmask() | (self.max_transfers << PRODUCT_BITS)
+
+    @classmethod
+    def from_key(cls, key: int, name: str = "") -> "Variant":
+        return cls(
+            products=DestinationProducts.from_bitmask(key & ((1 << PRODUCT_BITS) - 1)),
+            max_transfers=key >> PRODUCT_BITS,
+            name=name,
+        )
+
+    @classmethod
+    def parse(cls, spec: str) -> "Variant":
+        """Parse a variant like 'no_bus:1' (product preset and max. transfers)"""
+        preset, _, max_transfers = spec.partition(":")
+        if preset not in PRODUCT_PRESETS:
+            raise ValueError(
+                f"Unknown products {preset}. Choose one of {', '.join(PRODUCT_PRESETS)}."
+            )
+        return cls(
+            products=PRODUCT_PRESETS[preset],
+            max_transfers=int(max_transfers or 3),
+            name=spec,
+        )
+
+    def __str__(self) -> str:
+        return (
+            self.name or f"{','.join(self.products.as_list())} ({self.max_transfers})"
+        )
+
+
+class VariantLattice:
+    """Durations of all fetched variants over one shared station index"""
+
+    def __init__(self, destinations: list[Destination]):
+        self.destinations = destinations
+        self.destination_names = [d.name for d in destinations]
+        self.variants: dict[int, Variant] = {}
+        self.station_index: dict[str, int] = {}
+        self.stations: list[
+            Destination
+        ] = []  # name, location and products of each station
+        # stations x destinations durations by variant key; rows of stations added by later
+        # variants are appended on access
+        self._matrices: dict[int, np.ndarray] = {}
+
+    def __contains__(self, variant: Variant) -> bool:
+        return variant.key in self.variants
+
+    def add(
+        self,
+        variant: Variant,
+        reachable_by_destinations: dict[str, list[ReachableInMinutes]],
+    ) -> None:
+        """Merge the raw result of a variant into the lattice"""
+        rows: list[int] = []
+        columns: list[int] = []
+        durations: list[int] = []
+        for destination_index, destination in enumerate(self.destination_names):
+            for stops_by_duration in reachable_by_destinations.get(destination, []):
+                for stop in stops_by_duration.stations:
+                    if (station_index := self.station_index.get(stop.name)) is None:
+                        station_index = len(self.stations)
+                        self.station_index[stop.name] = station_index
+                        self.stations.append(stop)
+                    rows.append(station_index)
+                    columns.append(destination_index)
+                    durations.append(stops_by_duration.duration)
+        matrix = np.full(
+            (len(self.stations), len(self.destination_names)), NOT_REACHED, np.uint16
+        )
+        # a stop may be listed with several durations, the shortest one counts
+        np.minimum.at(
+            matrix,
+            (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)),
+            np.array(durations, dtype=np.uint16),
+        )
+        self.variants[variant.key] = variant
+        self._matrices[variant.key] = matrix
+
+    def durations(self, variant: Variant) -> np.ndarray:
+        """Stations x destinations matrix of durations, NOT_REACHED if not found"""
+        matrix = self._matrices[variant.key]
+        if (missing := len(self.stations) - len(matrix)) > 0:
+            matrix = np.vstack(
+                [
+                    matrix,
+                    np.full(
+                        (missing, len(self.destination_names)), NOT_REACHED, np.uint16
+                    ),
+                ]
+            )
+            self._matrices[variant.key] = matrix
+        return matrix
+
+    def get_stations(self, variant: Variant, max_duration: int) -> list[Station]:
+        """Stations of a variant with an average duration up to max_duration, equivalent to
+        unserialize_stations on the variant's raw result"""
+        matrix = self.durations(variant)
+        stations: list[Station] = []
+        for stop, durations in zip(self.stations, matrix.tolist(), strict=True):
+            if all(d == NOT_REACHED for d in durations):
+                continue
+            station = Station(
+                name=stop.name, coordinates=stop.coordinates, products=stop.products
+            )
+            for destination, duration in zip(
+                self.destination_names, durations, strict=True
+            ):
+                if duration != NOT_REACHED:
+                    station.add_duration(destination, duration)
+            station.fill_durations_not_found(self.destination_names, max_duration)
+            if station.get_weighted_duration() <= max_duration:
+                stations.append(station)
+        return stations
+
+
+@dataclass(frozen=True)
+class FetchOptions:
+    """Options shared by all variants, whose products and max. transfers replace those of
+    the query options"""
+
+    query: QueryOptions
+    horizon: int  # max. duration queried
+
+
+def fetch_variants(
+    destinations: list[str],
+    variants: list[Variant],
+    options: FetchOptions,
+    lattice: VariantLattice | None = None,
+) -> VariantLattice:
+    """Fetch the requested variants that are not yet part of the lattice concurrently"""
+    # pylint: disable-next=import-outside-toplevel
+    from berlin_public_transport_reachability.fetch import fetch_api_data
+
+    missing = list(
+        {v.key: v for v in variants if lattice is None or v not in lattice}.values()
+    )
+    with ThreadPoolExecutor(max_workers=len(missing) or 1) as executor:
+        futures = [
+            executor.submit(
+                fetch_api_data,
+                destinations=destinations,
+                max_duration=options.horizon,
+                options=replace(
+                    options.query,
+                    products=variant.products,
+                    max_transfers=variant.max_transfers,
+                ),
+            )
+            for variant in missing
+        ]
+        for variant, future in zip(missing, futures, strict=True):
+            destinations_, reachable_by_destinations = future.result()
+            if lattice is None:
+                lattice = VariantLattice(destinations_)
+            lattice.add(variant, reachable_by_destinations)
+
+    if lattice is None:
+        raise ValueError("No variants to fetch.")
+    logger.info(
+        f"Variant lattice with {len(lattice.variants)} variants and "
+        f"{len(lattice.stations)} stations."
+    )
+    return lattice
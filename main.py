@@ -1,33 +1,24 @@
+# pylint: disable=import-outside-toplevel
+# heavy dependencies (requests_cache, numpy, folium, shapely) are imported only where they are
+# needed, so `--help` and snapshot runs start fast
+import datetime
 import logging
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
 from pathlib import Path
-from typing import Literal
-
-import requests_cache
-
-from berlin_public_transport_reachability.entities import (
-    Destination,
-    ReachableInMinutes,
-)
-from berlin_public_transport_reachability.fetch import (
-    fetch_api_data,
-    load_ortsteile,
-    unserialize_stations,
-)
-from berlin_public_transport_reachability.map import ReachableMap
-from berlin_public_transport_reachability.settings import settings
-
-logging.basicConfig(level=logging.INFO, force=True)
-logging.getLogger("urllib3.connectionpool").setLevel(logging.WARNING)
-logging.getLogger("requests_cache").setLevel(logging.INFO)
+from typing import TYPE_CHECKING
+
+from berlin_public_transport_reachability.enums import TimeValue
+
+if TYPE_CHECKING:
+    from berlin_public_transport_reachability.entities import Destination, QueryOptions
+    from berlin_public_transport_reachability.station import Station
+
 logger = logging.getLogger(__name__)
 
-requests_cache.install_cache(
-    "test_cache", backend="sqlite", expire_after=2592000
-)  # 30 days
+TIME_CHOICES = [t.value for t in TimeValue]
 
 
-def parse_action() -> Literal["stations", "districts"]:
+def parse_args() -> Namespace:
     parser = ArgumentParser()
     parser.add_argument(
         "-a",
@@ -36,40 +27,616 @@ def parse_action() -> Literal["stations", "districts"]:
         default="stations",
         choices=["stations", "districts"],
     )
-    return parser.parse_args().action  # type: ignore[no-any-return]
+    parser.add_argument(
+        "--from-snapshot",
+        help="Load destinations and stations from a snapshot file instead of the api",
+        type=Path,
+    )
+    parser.add_argument(
+        "--save-snapshot",
+        help="Save destinations and stations to a snapshot file",
+        type=Path,
+    )
+    parser.add_argument(
+        "--offline",
+        help="Serve api requests only from the cache and fail on cache misses",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--variants",
+        help="Draw one layer per variant of products and max. transfers, e.g. "
+        "'default:3 no_bus:3 rail_only:0'; presets: default, no_bus, rail_only, with_regional",
+        nargs="+",
+    )
+    parser.add_argument(
+        "--serve",
+        help="After drawing, serve the map on this port with route details loaded on click",
+        type=int,
+        metavar="PORT",
+    )
+    parser.add_argument(
+        "--city",
+        help="Fetch these destinations from this provider instead of the configured ones, "
+        "e.g. 'db=Marienplatz,München Hbf'; repeat for several cities, which are fetched "
+        "concurrently",
+        action="append",
+        metavar="PROVIDER=DESTINATIONS",
+    )
+    parser.add_argument(
+        "--matrix",
+        help="Answer destinations that are stops from a precomputed stop matrix directory",
+        type=Path,
+    )
 
+    subparsers = parser.add_subparsers(dest="command")
+    cache_parser = subparsers.add_parser(
+        "cache", help="Inspect and manage the api cache"
+    )
+    cache_subparsers = cache_parser.add_subparsers(dest="cache_command", required=True)
 
-if __name__ == "__main__":
-    destinations: list[Destination]
-    reachable_by_destinations: dict[str, list[ReachableInMinutes]]
+    list_parser = cache_subparsers.add_parser("list", help="List cached entries")
+    list_parser.add_argument("--destination", help="Only entries of this destination")
+    list_parser.add_argument(
+        "--time", help="Only entries of this time slot", choices=TIME_CHOICES
+    )
+
+    prune_parser = cache_subparsers.add_parser(
+        "prune", help="Delete expired entries (and optionally more)"
+    )
+    prune_parser.add_argument(
+        "--older-than", help="Also delete entries older than n days", type=int
+    )
+    prune_parser.add_argument(
+        "--destination", help="Also delete entries of this destination"
+    )
+    prune_parser.add_argument(
+        "--time",
+        help="Also delete entries of this time slot (of the destination, if given)",
+        choices=TIME_CHOICES,
+    )
+
+    warm_parser = cache_subparsers.add_parser(
+        "warm", help="Pre-fetch destinations x time slots concurrently"
+    )
+    warm_parser.add_argument(
+        "--time",
+        help="Time slot(s) to fetch; defaults to the configured one",
+        action="append",
+        choices=TIME_CHOICES,
+    )
+    warm_parser.add_argument(
+        "--workers", help="Number of concurrent requests", type=int, default=8
+    )
+
+    export_parser = cache_subparsers.add_parser(
+        "export", help="Export cached entries as json lines"
+    )
+    export_parser.add_argument("path", type=Path)
+    export_parser.add_argument("--destination", help="Only entries of this destination")
+    export_parser.add_argument(
+        "--time", help="Only entries of this time slot", choices=TIME_CHOICES
+    )
+
+    query_parser = subparsers.add_parser(
+        "query", help="Query stations by durations, products and districts (csv/json)"
+    )
+    query_parser.add_argument(
+        "--max-duration", help="Max. duration to all destinations", type=int
+    )
+    query_parser.add_argument(
+        "--destination-max",
+        help="Max. duration to a specific destination, e.g. 'Mehringdamm=20'",
+        action="append",
+        default=[],
+    )
+    query_parser.add_argument("--max-average", help="Max. average duration", type=int)
+    query_parser.add_argument(
+        "--products", help="Required products, e.g. 'U,S' (see abbreviations in popups)"
+    )
+    query_parser.add_argument("--bezirk", help="Only stations in this Bezirk")
+    query_parser.add_argument("--ortsteil", help="Only stations in this Ortsteil")
+    query_parser.add_argument(
+        "--districts",
+        help="Include Ortsteil and Bezirk in the output",
+        action="store_true",
+    )
+    query_parser.add_argument(
+        "--sort", help="'worst' (default), 'average' or a destination", default="worst"
+    )
+    query_parser.add_argument(
+        "--limit", help="Return the top k stations only", type=int
+    )
+    query_parser.add_argument("--format", choices=["csv", "json"], default="csv")
+
+    matrix_parser = subparsers.add_parser(
+        "matrix", help="Precompute a stop x stop matrix"
+    )
+    matrix_subparsers = matrix_parser.add_subparsers(
+        dest="matrix_command", required=True
+    )
+    build_parser = matrix_subparsers.add_parser(
+        "build", help="Build (or resume building) a matrix for the configured time slot"
+    )
+    build_parser.add_argument("path", type=Path)
+    build_parser.add_argument(
+        "--horizon",
+        help="Max. duration in minutes; defaults to max_duration + 60",
+        type=int,
+    )
+    build_parser.add_argument(
+        "--seed",
+        help="Stop(s) whose reachable stops form the stop index; defaults to the destinations",
+        action="append",
+    )
+    build_parser.add_argument(
+        "--concurrency", help="Number of concurrent requests", type=int, default=4
+    )
+
+    args = parser.parse_args()
+    # stations of different cities lack durations to each other's destinations, so they can
+    # only be drawn
+    if args.city and (
+        args.command
+        or args.action != "stations"
+        or args.from_snapshot
+        or args.save_snapshot
+        or args.serve is not None
+        or args.matrix
+    ):
+        parser.error("--city only supports drawing stations")
+    # variants are fetched from the api and drawn as layers of the stations map
+    if args.variants and (
+        args.command
+        or args.action != "stations"
+        or args.city
+        or args.from_snapshot
+        or args.save_snapshot
+        or args.serve is not None
+        or args.matrix
+    ):
+        parser.error("--variants only supports drawing stations from the api")
+    return args
+
+
+def setup_logging() -> None:
+    logging.basicConfig(level=logging.INFO, force=True)
+    logging.getLogger("urllib3.connectionpool").setLevel(logging.WARNING)
+    logging.getLogger("requests_cache").setLevel(logging.INFO)
+
+
+def get_query_options(time: TimeValue | None = None) -> "QueryOptions":
+    """the configured query options, optionally for another time slot"""
+    from berlin_public_transport_reachability.entities import QueryOptions
+    from berlin_public_transport_reachability.providers import get_provider
+    from berlin_public_transport_reachability.settings import get_settings
+
+    settings = get_settings()
+    return QueryOptions(
+        time=time or settings.destination.time,
+        max_transfers=settings.destination.max_transfers,
+        provider=get_provider(settings.destination.provider),
+    )
+
+
+def run_cache_command(args: Namespace) -> None:
+    from berlin_public_transport_reachability import cache
+    from berlin_public_transport_reachability.settings import get_settings
+
+    if args.cache_command == "warm":
+        settings = get_settings()
+        times = (
+            [TimeValue(t) for t in args.time]
+            if args.time
+            else [settings.destination.time]
+        )
+        cache.warm(
+            destinations=settings.destination.destinations,
+            options=[get_query_options(time) for time in times],
+            max_duration=settings.general.max_duration + 60,
+            workers=args.workers,
+        )
+        return
+
+    time = TimeValue(args.time) if args.time else None
+    if args.cache_command == "list":
+        cache.print_entries(destination=args.destination, time=time)
+    elif args.cache_command == "prune":
+        cache.prune(
+            older_than=datetime.timedelta(days=args.older_than)
+            if args.older_than is not None
+            else None,
+            destination=args.destination,
+            time=time,
+        )
+    elif args.cache_command == "export":
+        cache.export(args.path, destination=args.destination, time=time)
+
+
+def run_matrix_command(args: Namespace) -> None:
+    from berlin_public_transport_reachability.cache import install_cache
+    from berlin_public_transport_reachability.settings import get_settings
+    from berlin_public_transport_reachability.stop_matrix import build_stop_matrix
+
+    settings = get_settings()
+    install_cache(offline=args.offline)
+    build_stop_matrix(
+        path=args.path,
+        seeds=args.seed or settings.destination.destinations,
+        options=get_query_options(),
+        horizon=args.horizon or settings.general.max_duration + 60,
+        concurrency=args.concurrency,
+    )
+
+
+def fetch_cities(
+    cities: list[str], *, offline: bool
+) -> tuple[list["Destination"], list["Station"]]:
+    """fetch the destinations of several providers (e.g. cities) concurrently, each given as
+    'PROVIDER=DESTINATION,DESTINATION'; stations are determined per provider"""
+    from berlin_public_transport_reachability.cache import install_cache
+    from berlin_public_transport_reachability.fetch import (
+        fetch_api_data_by_provider,
+        unserialize_stations,
+    )
+    from berlin_public_transport_reachability.providers import Provider, get_provider
+    from berlin_public_transport_reachability.settings import get_settings
+
+    settings = get_settings()
+    install_cache(offline=offline)
+    # the destinations of a provider given more than once are merged
+    destinations_by_provider: dict[Provider, list[str]] = {}
+    for city in cities:
+        provider, _, names = city.partition("=")
+        if not names:
+            raise ValueError(
+                f"Invalid city {city}, expected 'PROVIDER=DESTINATION,...'."
+            )
+        queries = destinations_by_provider.setdefault(get_provider(provider), [])
+        queries += [n for n in names.split(",") if n not in queries]
+    results = fetch_api_data_by_provider(
+        destinations_by_provider,
+        max_duration=settings.general.max_duration + 60,
+        options=get_query_options(),
+    )
+    destinations: list["Destination"] = []
+    stations: list["Station"] = []
+    for destinations_, reachable_by_destinations in results.values():
+        destinations += destinations_
+        stations += unserialize_stations(
+            reachable_by_destinations=reachable_by_destinations,
+            max_duration=settings.general.max_duration,
+        )
+    return destinations, stations
+
+
+def fetch_stations(
+    *, offline: bool, matrix: Path | None = None
+) -> tuple[list["Destination"], list["Station"]]:
+    from berlin_public_transport_reachability.cache import install_cache
+    from berlin_public_transport_reachability.fetch import (
+        fetch_api_data,
+        fetch_stations_with_matrix,
+        unserialize_stations,
+    )
+    from berlin_public_transport_reachability.settings import get_settings
+
+    settings = get_settings()
+    install_cache(offline=offline)
+    options = get_query_options()
+    if matrix is not None:
+        from berlin_public_transport_reachability.stop_matrix import StopMatrix
+
+        return fetch_stations_with_matrix(
+            destinations=settings.destination.destinations,
+            max_duration=settings.general.max_duration,
+            horizon=settings.general.max_duration + 60,
+            options=options,
+            stop_matrix=StopMatrix(matrix),
+        )
     destinations, reachable_by_destinations = fetch_api_data(
         destinations=settings.destination.destinations,
         max_duration=settings.general.max_duration + 60,
-        max_transfers=settings.destination.max_transfers,
-        time=settings.destination.time,
+        options=options,
     )
 
-    # destinations = unserialize_destinations(destinations_raw=destinations_raw)
     stations = unserialize_stations(
         reachable_by_destinations=reachable_by_destinations,
         max_duration=settings.general.max_duration,
     )
+    return destinations, stations
+
+
+def read_snapshot(path: Path) -> tuple[list["Destination"], list["Station"]]:
+    """load a snapshot, filtered by the configured max. duration, and warn if it was fetched
+    with other settings"""
+    from berlin_public_transport_reachability.settings import get_settings
+    from berlin_public_transport_reachability.snapshot import load_snapshot
 
-    # depending on cli argument, draw either stations or districts
-    if (action := parse_action()) == "stations":
+    settings = get_settings()
+    destinations, stations, parameters = load_snapshot(
+        path, max_duration=settings.general.max_duration
+    )
+    configured = {
+        "time": settings.destination.time,
+        "provider": settings.destination.provider,
+        "max_transfers": settings.destination.max_transfers,
+    }
+    for name, value in configured.items():
+        if getattr(parameters, name) != value:
+            logger.warning(
+                f"Snapshot was fetched with {name} {getattr(parameters, name)}, "
+                f"not the configured {value}."
+            )
+    return destinations, stations
+
+
+def write_snapshot(
+    path: Path, destinations: list["Destination"], stations: list["Station"]
+) -> None:
+    from berlin_public_transport_reachability.settings import get_settings
+    from berlin_public_transport_reachability.snapshot import (
+        SnapshotParameters,
+        save_snapshot,
+    )
+
+    settings = get_settings()
+    parameters = SnapshotParameters(
+        max_duration=settings.general.max_duration,
+        time=settings.destination.time,
+        provider=settings.destination.provider,
+        max_transfers=settings.destination.max_transfers,
+    )
+    save_snapshot(
+        path, destinations=destinations, stations=stations, parameters=parameters
+    )
+
+
+def draw_variants(specs: list[str], *, offline: bool) -> None:
+    from berlin_public_transport_reachability.cache import install_cache
+    from berlin_public_transport_reachability.map import ReachableMap
+    from berlin_public_transport_reachability.settings import get_settings
+    from berlin_public_transport_reachability.variants import (
+        FetchOptions,
+        Variant,
+        fetch_variants,
+    )
+
+    settings = get_settings()
+    install_cache(offline=offline)
+    variants = [Variant.parse(spec) for spec in specs]
+    lattice = fetch_variants(
+        destinations=settings.destination.destinations,
+        variants=variants,
+        options=FetchOptions(
+            query=get_query_options(), horizon=settings.general.max_duration + 60
+        ),
+    )
+    stations_by_variant = {
+        str(v): lattice.get_stations(v, max_duration=settings.general.max_duration)
+        for v in variants
+    }
+    logger.info("Drawing Variants")
+    ReachableMap(
+        destinations=lattice.destinations,
+        stations=stations_by_variant[str(variants[0])],
+        circle_radius=settings.general.circle_radius,
+    ).draw_variants(stations_by_variant)
+
+
+def run_query(
+    args: Namespace, destinations: list["Destination"], stations: list["Station"]
+) -> None:
+    import sys
+
+    from berlin_public_transport_reachability.entities import (
+        DestinationProducts,
+        abbreviation_map,
+    )
+    from berlin_public_transport_reachability.query import (
+        StationIndex,
+        StationQuery,
+        write_results,
+    )
+
+    products = None
+    if args.products:
+        abbreviations = {v: k for k, v in abbreviation_map.items()}
+        requested = {
+            abbreviations.get(p.strip().upper()) for p in args.products.split(",")
+        }
+        if None in requested:
+            raise ValueError(
+                f"Unknown products {args.products}. Use {', '.join(abbreviations)}."
+            )
+        products = DestinationProducts(
+            **{k: k in requested for k in DestinationProducts.__fields__}
+        )
+
+    ortsteile = None
+    if args.districts or args.bezirk or args.ortsteil:
+        from berlin_public_transport_reachability.fetch import load_ortsteile
+        from berlin_public_transport_reachability.providers import get_provider
+        from berlin_public_transport_reachability.settings import get_settings
+
+        settings = get_settings()
+        provider = get_provider(settings.destination.provider)
+        if provider.regions_path is None:
+            raise ValueError(
+                f"No district polygons available for provider {provider.name}."
+            )
+        ortsteile = load_ortsteile(
+            path=provider.regions_path,
+            stations=stations,
+            workers=settings.general.workers,
+        )
+
+    index = StationIndex(stations, ortsteile=ortsteile)
+    results = index.query(
+        StationQuery(
+            max_durations={
+                name: int(minutes)
+                for name, _, minutes in (
+                    d.rpartition("=") for d in args.destination_max
+                )
+            },
+            max_duration=args.max_duration,
+            max_average=args.max_average,
+            products=products,
+            bezirk=args.bezirk,
+            ortsteil=args.ortsteil,
+            sort_by=args.sort,
+            limit=args.limit,
+        )
+    )
+    logger.info(
+        f"{len(results)} stations match (of {len(stations)}, {len(destinations)} destinations)."
+    )
+    write_results(results, sys.stdout, args.format)
+
+
+def draw(
+    action: str,
+    destinations: list["Destination"],
+    stations: list["Station"],
+    *,
+    serving: bool = False,
+) -> None:
+    """depending on cli argument, draw either stations or districts; when serving, the map is
+    opened from the route server and its popups link the routes"""
+    from berlin_public_transport_reachability import html_writer
+    from berlin_public_transport_reachability.settings import get_settings
+
+    settings = get_settings()
+    if action == "stations":
         logger.info("Drawing Stations")
+        if settings.general.streaming_html:
+            html_writer.stream_reachable_stations(
+                destinations=destinations,
+                stations=stations,
+                circle_radius=settings.general.circle_radius,
+                open_browser=not serving,
+                routes=serving,
+            )
+            return
+
+        from berlin_public_transport_reachability.map import ReachableMap
+
         ReachableMap(
             destinations=destinations,
             stations=stations,
             circle_radius=settings.general.circle_radius,
+            open_browser=not serving,
+            routes=serving,
         ).draw_reachable_stations()
     elif action == "districts":
+        from berlin_public_transport_reachability.fetch import load_ortsteile
+        from berlin_public_transport_reachability.providers import get_provider
+
+        provider = get_provider(settings.destination.provider)
+        if provider.regions_path is None:
+            raise ValueError(
+                f"No district polygons available for provider {provider.name}."
+            )
         logger.info("Drawing Districts")
         ortsteile = load_ortsteile(
-            path=Path("./static/lor_ortsteile.geojson"), stations=stations
+            path=provider.regions_path,
+            stations=stations,
+            workers=settings.general.workers,
         )
+        if settings.general.streaming_html:
+            html_writer.stream_ortsteile(
+                destinations=destinations,
+                ortsteile=ortsteile,
+                circle_radius=settings.general.circle_radius,
+                open_browser=not serving,
+            )
+            return
+
+        from berlin_public_transport_reachability.map import ReachableMap
+
         ReachableMap(
             destinations=destinations,
             stations=stations,
             circle_radius=settings.general.circle_radius,
+            open_browser=not serving,
         ).draw_ortsteile(ortsteile=ortsteile)
+
+
+def serve(
+    port: int,
+    destinations: list["Destination"],
+    stations: list["Station"],
+    *,
+    offline: bool,
+) -> None:
+    import webbrowser
+
+    from berlin_public_transport_reachability.cache import install_cache
+    from berlin_public_transport_reachability.routes import RouteResolver, RouteServer
+
+    install_cache(offline=offline)
+    resolver = RouteResolver(
+        destinations=destinations, stations=stations, options=get_query_options()
+    )
+    server = RouteServer(
+        ("127.0.0.1", port), resolver=resolver, page=Path("index.html")
+    )
+    url = f"{server.base_url}/index.html"
+    logger.info(f"Serving map with route details at {url}")
+    # the server is listening already, so the browser's request waits for serve_forever
+    webbrowser.open(url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging()
+
+    if args.command == "cache":
+        run_cache_command(args)
+        raise SystemExit
+
+    if args.command == "matrix":
+        run_matrix_command(args)
+        raise SystemExit
+
+    if args.variants:
+        draw_variants(args.variants, offline=args.offline)
+        raise SystemExit
+
+    destinations: list["Destination"]
+    stations: list["Station"]
+    if args.from_snapshot:
+        destinations, stations = read_snapshot(args.from_snapshot)
+    elif args.city:
+        destinations, stations = fetch_cities(args.city, offline=args.offline)
+    else:
+        destinations, stations = fetch_stations(
+            offline=args.offline, matrix=args.matrix
+        )
+
+    if args.save_snapshot:
+        write_snapshot(args.save_snapshot, destinations=destinations, stations=stations)
+
+    if args.command == "query":
+        run_query(args, destinations=destinations, stations=stations)
+        raise SystemExit
+
+    # when serving, the map is opened from the server, which also answers the route requests
+    draw(
+        args.action,
+        destinations=destinations,
+        stations=stations,
+        serving=args.serve is not None,
+    )
+
+    if args.serve is not None:
+        serve(
+            args.serve,
+            destinations=destinations,
+            stations=stations,
+            offline=args.offline,
+        )
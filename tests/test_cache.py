@@ -0,0 +1,85 @@
+"""Response cache against the local stub server"""
+import datetime
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+import requests_cache
+
+from berlin_public_transport_reachability import cache, transport_api
+from berlin_public_transport_reachability.entities import QueryOptions
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.fetch import fetch_api_data
+from berlin_public_transport_reachability.providers import Provider
+from berlin_public_transport_reachability.stub_server import StubConfig, StubServer
+
+LOCATION = {
+    "type": "stop",
+    "id": "900017101",
+    "name": "U Mehringdamm (Berlin)",
+    "location": {"type": "location", "latitude": 52.493567, "longitude": 13.38814},
+    "products": {
+        p: True for p in ("suburban", "subway", "tram", "bus", "ferry", "express")
+    }
+    | {"regional": False},
+}
+
+
+@pytest.fixture()
+def server(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[StubServer]:
+    # the cache lives in the working directory; the shared session is created after it
+    monkeypatch.chdir(tmp_path)
+    recorded = tmp_path.joinpath("recorded.jsonl")
+    record = {"url": "/locations?query=Mehringdamm&results=1", "body": [LOCATION]}
+    recorded.write_text(json.dumps(record) + "\n", encoding="utf-8")
+    server = StubServer(
+        ("127.0.0.1", 0), StubConfig(count_stations=100, recorded=recorded)
+    ).start()
+    transport_api._create_session.cache_clear()  # noqa: SLF001
+    yield server
+    server.stop()
+    requests_cache.uninstall_cache()  # type: ignore[no-untyped-call]
+    transport_api._create_session.cache_clear()  # noqa: SLF001
+
+
+def _fetch(server: StubServer, *, offline: bool) -> list[str]:
+    cache.install_cache(offline=offline)
+    transport_api._create_session.cache_clear()  # noqa: SLF001
+    provider = Provider(
+        name="stub",
+        base_url=server.base_url,
+        timezone="Europe/Berlin",
+        requests_per_second=1000,
+    )
+    _, reachable = fetch_api_data(
+        ["Mehringdamm"],
+        max_duration=30,
+        options=QueryOptions(
+            time=TimeValue.NEXT_WORKDAY_NOON, max_transfers=2, provider=provider
+        ),
+    )
+    return [s.name for r in reachable["U Mehringdamm (Berlin)"] for s in r.stations]
+
+
+def test_offline_after_time_slot_rolled_over(
+    server: StubServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    warmed = _fetch(server, offline=False)
+    get_when = transport_api.get_when
+
+    def get_next_when(time: TimeValue, timezone: str) -> str:
+        when = datetime.datetime.fromisoformat(get_when(time, timezone))
+        return (when + datetime.timedelta(days=7)).isoformat()
+
+    monkeypatch.setattr(transport_api, "get_when", get_next_when)
+    assert _fetch(server, offline=True) == warmed
+    assert server.requests["/stops/reachable-from 200"] == 1
+
+
+def test_destination_matches_query_and_resolved_name(server: StubServer) -> None:
+    _fetch(server, offline=False)
+    endpoints = {e.endpoint for e in cache.list_entries(destination="Mehringdamm")}
+    assert endpoints == {"/locations", "/stops/reachable-from"}
+    assert cache.prune(destination="U Mehringdamm (Berlin)") == 2
+    assert not list(cache.list_entries())
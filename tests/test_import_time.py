@@ -0,0 +1,93 @@
+"""Import-time budgets for the cli entry point, measured with `python -X importtime` in a fresh
+interpreter. Modules imported by the interpreter itself (site) are not counted."""
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from berlin_public_transport_reachability.entities import (
+    DEFAULT_PRODUCTS,
+    Destination,
+    DestinationLocation,
+)
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.settings import get_settings
+from berlin_public_transport_reachability.snapshot import (
+    SnapshotParameters,
+    save_snapshot,
+)
+from berlin_public_transport_reachability.station import Station
+
+MAIN_PATH = Path(__file__).resolve().parent.parent.joinpath("main.py")
+# budgets in microseconds, generous to keep slow machines green while catching eager imports
+HELP_BUDGET = 150_000
+SNAPSHOT_RENDER_BUDGET = 1_500_000
+
+_IMPORT_TIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)$")
+
+
+def _import_times(args: list[str], cwd: Path) -> dict[str, int]:
+    """Run main.py and return the cumulative import time of each top-level import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", str(MAIN_PATH), *args],  # noqa: S603
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "BROWSER": "true"},  # don't open the drawn map
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if (match := _IMPORT_TIME.match(line)) is not None:
+            times[match[2]] = int(match[1])
+    times.pop("site", None)
+    return times
+
+
+def _imported(times: dict[str, int], modules: set[str]) -> set[str]:
+    return {m for m in times if m.split(".")[0] in modules}
+
+
+@pytest.fixture()
+def snapshot_path(tmp_path: Path) -> Path:
+    settings = get_settings()
+    destination = Destination(
+        name="Alexanderplatz",
+        location=DestinationLocation(latitude=52.521512, longitude=13.411267),
+        products=DEFAULT_PRODUCTS,
+    )
+    station = Station(
+        name="Mehringdamm", coordinates=(52.493567, 13.38814), products=DEFAULT_PRODUCTS
+    )
+    station.add_duration(destination.name, 10)
+    path = tmp_path.joinpath("run.npz")
+    save_snapshot(
+        path,
+        destinations=[destination],
+        stations=[station],
+        parameters=SnapshotParameters(
+            max_duration=settings.general.max_duration,
+            time=TimeValue.NEXT_WORKDAY_NOON,
+            provider="bvg",
+            max_transfers=2,
+        ),
+    )
+    return path
+
+
+def test_help_imports_no_dependencies(tmp_path: Path) -> None:
+    times = _import_times(["--help"], cwd=tmp_path)
+    dependencies = {"folium", "shapely", "pydantic", "colour", "pytz", "numpy"}
+    assert not _imported(times, dependencies | {"requests", "requests_cache"})
+    assert sum(times.values()) < HELP_BUDGET
+
+
+def test_snapshot_render_imports(tmp_path: Path, snapshot_path: Path) -> None:
+    times = _import_times(["--from-snapshot", str(snapshot_path)], cwd=tmp_path)
+    # drawing stations needs neither polygons nor the api client
+    assert not _imported(times, {"shapely", "pytz", "requests_cache"})
+    assert tmp_path.joinpath("index.html").exists()
+    assert sum(times.values()) < SNAPSHOT_RENDER_BUDGET
@@ -0,0 +1,124 @@
+"""Providers and the transport api client against the local stub server"""
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from berlin_public_transport_reachability.entities import QueryOptions
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.fetch import (
+    fetch_api_data,
+    fetch_api_data_by_provider,
+)
+from berlin_public_transport_reachability.providers import (
+    PROVIDERS,
+    Provider,
+    RateLimiter,
+)
+from berlin_public_transport_reachability.stub_server import StubConfig, StubServer
+from berlin_public_transport_reachability.transport_api import get
+
+OPTIONS = QueryOptions(time=TimeValue.NEXT_WORKDAY_NOON, max_transfers=2)
+
+
+def _start(config: StubConfig) -> StubServer:
+    return StubServer(("127.0.0.1", 0), config).start()
+
+
+def _provider(server: StubServer, name: str = "stub") -> Provider:
+    return Provider(
+        name=name,
+        base_url=server.base_url,
+        timezone="Europe/Berlin",
+        requests_per_second=1000,
+    )
+
+
+@pytest.fixture()
+def server() -> Iterator[StubServer]:
+    server = _start(StubConfig(count_stations=500))
+    yield server
+    server.stop()
+
+
+def test_db_products_translation() -> None:
+    db = PROVIDERS["db"]
+    params = db.products_to_params(
+        {p: p == "express" for p in ("suburban", "subway", "tram", "bus", "ferry")}
+        | {"express": True, "regional": False}
+    )
+    assert params["nationalExpress"]
+    assert params["national"]
+    assert not params["regionalExpress"]
+    assert not params["regional"]
+    products = db.products_from_response({"national": True, "regionalExpress": True})
+    assert products["express"]
+    assert products["regional"]
+    assert not products["bus"]
+
+
+def test_fetch_api_data(server: StubServer) -> None:
+    options = QueryOptions(
+        time=OPTIONS.time, max_transfers=2, provider=_provider(server)
+    )
+    destinations, reachable = fetch_api_data(
+        destinations=["Alexanderplatz", "Mehringdamm"], max_duration=20, options=options
+    )
+    assert [d.name for d in destinations] == ["Alexanderplatz", "Mehringdamm"]
+    assert set(reachable) == {"Alexanderplatz", "Mehringdamm"}
+    for durations in reachable.values():
+        assert durations
+        assert all(r.duration <= 20 and r.stations for r in durations)
+    assert server.requests["/locations 200"] == 2
+    assert server.requests["/stops/reachable-from 200"] == 2
+
+
+@pytest.mark.parametrize(
+    ("status", "config"),
+    [
+        (429, StubConfig(count_stations=10, seed=1, rate_429=0.2)),
+        (503, StubConfig(count_stations=10, seed=1, rate_5xx=0.2)),
+    ],
+)
+def test_get_retries(status: int, config: StubConfig) -> None:
+    # with this seed, the first request fails and the second one succeeds
+    server = _start(config)
+    try:
+        response = get(
+            _provider(server), server.base_url + "/locations", {"query": "A"}
+        )
+    finally:
+        server.stop()
+    assert response.json()[0]["name"] == "A"
+    assert server.requests[f"/locations {status}"] == 1
+    assert server.requests["/locations 200"] == 1
+
+
+def test_rate_limiter() -> None:
+    limiter = RateLimiter(requests_per_second=50)
+    start = time.monotonic()
+    for _ in range(11):
+        limiter.wait()
+    # the first request passes immediately, the others are spaced by 1/50 s
+    assert time.monotonic() - start >= 10 / 50
+
+
+def test_fetch_api_data_by_provider() -> None:
+    servers = [_start(StubConfig(count_stations=100, seed=i)) for i in range(2)]
+    try:
+        providers = [_provider(s, name=f"stub{i}") for i, s in enumerate(servers)]
+        results = fetch_api_data_by_provider(
+            {
+                providers[0]: ["Alexanderplatz"],
+                providers[1]: ["Marienplatz", "Stachus"],
+            },
+            max_duration=30,
+            options=OPTIONS,
+        )
+    finally:
+        for server in servers:
+            server.stop()
+    assert [d.name for d in results[providers[0]][0]] == ["Alexanderplatz"]
+    assert [d.name for d in results[providers[1]][0]] == ["Marienplatz", "Stachus"]
+    assert servers[0].requests["/stops/reachable-from 200"] == 1
+    assert servers[1].requests["/stops/reachable-from 200"] == 2
@@ -0,0 +1,98 @@
+"""StationIndex queries over a handful of stations"""
+import pytest
+
+from berlin_public_transport_reachability.entities import (
+    DestinationProducts,
+    GeoFeature,
+)
+from berlin_public_transport_reachability.ortsteil import Ortsteil
+from berlin_public_transport_reachability.query import StationIndex, StationQuery
+from berlin_public_transport_reachability.station import Station
+
+DESTINATIONS = ["A", "B", "C"]
+RAIL = DestinationProducts.from_bitmask(0b0000011)  # S, U
+BUS = DestinationProducts.from_bitmask(0b0001000)
+
+
+def _station(
+    name: str, durations: dict[str, int], products: DestinationProducts = RAIL
+) -> Station:
+    station = Station(name=name, coordinates=(52.5, 13.4), products=products)
+    for destination, duration in durations.items():
+        station.add_duration(destination, duration)
+    station.fill_durations_not_found(DESTINATIONS, max_duration=30)
+    return station
+
+
+def _ortsteil(name: str, bezirk: str, stations: list[Station]) -> Ortsteil:
+    feature: GeoFeature = {
+        "type": "Feature",
+        "properties": {
+            "OTEIL": name,
+            "BEZIRK": bezirk,
+            "FLAECHE_HA": 1.0,
+            "spatial_alias": name,
+            "average_duration": None,
+            "min_duration": None,
+            "max_duration": None,
+            "count_stations": None,
+        },
+        "geometry": {"type": "Polygon"},
+        "product_codes": [],
+    }
+    ortsteil = Ortsteil(feature, geometry=object())
+    for station in stations:
+        ortsteil.add_station(station)
+    return ortsteil
+
+
+@pytest.fixture()
+def index() -> StationIndex:
+    stations = [
+        _station("Near", {"A": 5, "B": 10, "C": 15}),
+        _station("Far", {"A": 25, "B": 20, "C": 28}, products=BUS),
+        # found for A only: its placeholders (the average, 2 min) must not match
+        _station("Only A", {"A": 2}),
+        _station("Middle", {"A": 12, "B": 8, "C": 10}, products=BUS),
+    ]
+    ortsteile = [
+        _ortsteil("Kreuzberg", "Friedrichshain-Kreuzberg", stations[:2]),
+        _ortsteil("Mitte", "Mitte", stations[2:]),
+    ]
+    return StationIndex(stations, ortsteile=ortsteile)
+
+
+def _names(index: StationIndex, query: StationQuery) -> list[str]:
+    return [r.station.name for r in index.query(query)]
+
+
+def test_range_queries_exclude_unreached_destinations(index: StationIndex) -> None:
+    assert _names(index, StationQuery(max_duration=30)) == ["Middle", "Near", "Far"]
+    assert _names(index, StationQuery(max_durations={"B": 10})) == ["Middle", "Near"]
+    assert _names(index, StationQuery(max_durations={"A": 5})) == ["Near", "Only A"]
+    assert _names(index, StationQuery(max_average=15)) == ["Middle", "Near"]
+
+
+def test_unreached_destinations_sort_last(index: StationIndex) -> None:
+    results = index.query(StationQuery(sort_by="B"))
+    assert [r.station.name for r in results] == ["Middle", "Near", "Far", "Only A"]
+    assert (results[-1].worst, results[-1].average) == (None, None)
+    assert results[-1].as_dict()["B"] is None
+    assert results[-1].as_dict()["A"] == 2
+
+
+def test_top_k(index: StationIndex) -> None:
+    assert _names(index, StationQuery(sort_by="A", limit=2)) == ["Only A", "Near"]
+    assert _names(index, StationQuery(max_duration=30, limit=1)) == ["Middle"]
+
+
+def test_product_and_region_filters(index: StationIndex) -> None:
+    assert _names(index, StationQuery(products=BUS, sort_by="A")) == ["Middle", "Far"]
+    assert _names(index, StationQuery(bezirk="Mitte", sort_by="A")) == [
+        "Only A",
+        "Middle",
+    ]
+    assert _names(index, StationQuery(ortsteil="Kreuzberg", products=RAIL)) == ["Near"]
+    assert not _names(index, StationQuery(ortsteil="Mitte", max_duration=10))
+    result = index.query(StationQuery(ortsteil="Kreuzberg", limit=1))[0]
+    assert (result.ortsteil, result.bezirk) == ("Kreuzberg", "Friedrichshain-Kreuzberg")
@@ -0,0 +1,115 @@
+"""Route server against the local stub server"""
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import pytest
+
+from berlin_public_transport_reachability.entities import (
+    DEFAULT_PRODUCTS,
+    Destination,
+    DestinationLocation,
+    QueryOptions,
+)
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.html_writer import stream_reachable_stations
+from berlin_public_transport_reachability.providers import Provider
+from berlin_public_transport_reachability.routes import (
+    ROUTE_SCRIPT,
+    RouteResolver,
+    RouteServer,
+)
+from berlin_public_transport_reachability.station import Station
+from berlin_public_transport_reachability.stub_server import StubConfig, StubServer
+
+
+@pytest.fixture()
+def server(tmp_path: Path) -> Iterator[RouteServer]:
+    stub = StubServer(("127.0.0.1", 0), StubConfig(count_stations=10)).start()
+    provider = Provider(
+        name="stub",
+        base_url=stub.base_url,
+        timezone="Europe/Berlin",
+        requests_per_second=1000,
+    )
+    destination = Destination(
+        name="Alexanderplatz",
+        location=DestinationLocation(latitude=52.521512, longitude=13.411267),
+        products=DEFAULT_PRODUCTS,
+    )
+    station = Station(
+        name="Mehringdamm", coordinates=(52.493567, 13.38814), products=DEFAULT_PRODUCTS
+    )
+    resolver = RouteResolver(
+        destinations=[destination],
+        stations=[station],
+        options=QueryOptions(
+            time=TimeValue.NEXT_WORKDAY_NOON, max_transfers=2, provider=provider
+        ),
+    )
+    tmp_path.joinpath("index.html").write_text("<html></html>", encoding="utf-8")
+    tmp_path.joinpath("settings.toml").write_text("[general]", encoding="utf-8")
+    server = RouteServer(
+        ("127.0.0.1", 0), resolver=resolver, page=tmp_path.joinpath("index.html")
+    ).start()
+    yield server
+    server.stop()
+    stub.stop()
+
+
+def _get(url: str) -> tuple[int, bytes]:
+    try:
+        with urlopen(url) as response:  # noqa: S310
+            return response.status, response.read()
+    except HTTPError as error:
+        return error.code, error.read()
+
+
+def test_serves_only_the_map(server: RouteServer) -> None:
+    assert _get(f"{server.base_url}/index.html") == (200, b"<html></html>")
+    assert _get(f"{server.base_url}/settings.toml")[0] == 404
+    assert _get(f"{server.base_url}/../settings.toml")[0] == 404
+
+
+def test_route(server: RouteServer) -> None:
+    params = urlencode({"station": "Mehringdamm", "destination": "Alexanderplatz"})
+    status, body = _get(f"{server.base_url}/route?{params}")
+    assert status == 200
+    assert json.loads(body)["duration"] > 0
+
+    params = urlencode({"station": "Unknown", "destination": "Alexanderplatz"})
+    status, body = _get(f"{server.base_url}/route?{params}")
+    assert status == 404
+    assert json.loads(body) == {"error": "Unknown station Unknown."}
+
+
+def test_route_links_only_when_serving(tmp_path: Path) -> None:
+    destination = Destination(
+        name="Alexanderplatz",
+        location=DestinationLocation(latitude=52.521512, longitude=13.411267),
+        products=DEFAULT_PRODUCTS,
+    )
+    station = Station(
+        name="Mehringdamm", coordinates=(52.493567, 13.38814), products=DEFAULT_PRODUCTS
+    )
+    station.add_duration("Alexanderplatz", 12)
+    station.add_duration("Hermannplatz", 9)
+
+    assert "route" not in station.get_popup_text()
+    popup = station.get_popup_text(routes=True)
+    # tagged with the station once, the destination is taken from the clicked line
+    assert popup.count('data-station="Mehringdamm"') == 1
+    assert popup.count('class="route"') == 2
+    assert "Alexanderplatz: 12 min <a" in popup
+
+    for serving in (False, True):
+        path = tmp_path.joinpath("index.html")
+        stream_reachable_stations(
+            [destination], [station], 100, path, open_browser=False, routes=serving
+        )
+        page = path.read_text(encoding="utf-8")
+        assert (ROUTE_SCRIPT in page) is serving
+        assert ('class=\\"route\\"' in page) is serving
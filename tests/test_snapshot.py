@@ -0,0 +1,83 @@
+"""Snapshots round trip to the stations of a fresh run"""
+from pathlib import Path
+
+from berlin_public_transport_reachability.entities import (
+    DEFAULT_PRODUCTS,
+    Destination,
+    DestinationLocation,
+    ReachableInMinutes,
+)
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.fetch import unserialize_stations
+from berlin_public_transport_reachability.snapshot import (
+    SnapshotParameters,
+    load_snapshot,
+    save_snapshot,
+)
+
+
+def _stop(name: str) -> Destination:
+    return Destination(
+        name=name,
+        location=DestinationLocation(latitude=52.5, longitude=13.4),
+        products=DEFAULT_PRODUCTS,
+    )
+
+
+def _reachable(durations: dict[str, int]) -> list[ReachableInMinutes]:
+    return [
+        ReachableInMinutes(duration=duration, stations=[_stop(name)])
+        for name, duration in durations.items()
+    ]
+
+
+# 'Far' is not found for D: its placeholder is 2 * max_duration, so it is kept with a max.
+# duration of 40 (average 35) and, in a fresh run, also with 30 (average 30)
+REACHABLE = {
+    "A": _reachable({"Far": 20, "Near": 5, "Everywhere": 12}),
+    "B": _reachable({"Far": 20, "Near": 10, "Everywhere": 14}),
+    "C": _reachable({"Far": 20, "Everywhere": 16}),
+    "D": _reachable({"Everywhere": 18}),
+}
+
+
+def _save(path: Path, max_duration: int) -> None:
+    stations = unserialize_stations(REACHABLE, max_duration=max_duration)
+    save_snapshot(
+        path,
+        destinations=[_stop(name) for name in REACHABLE],
+        stations=stations,
+        parameters=SnapshotParameters(
+            max_duration=max_duration,
+            time=TimeValue.NEXT_WORKDAY_NOON,
+            provider="bvg",
+            max_transfers=2,
+        ),
+    )
+
+
+def test_round_trip(tmp_path: Path) -> None:
+    path = tmp_path.joinpath("run.npz")
+    _save(path, max_duration=40)
+    _, stations, parameters = load_snapshot(path)
+    expected = unserialize_stations(REACHABLE, max_duration=40)
+    assert parameters.max_duration == 40
+    assert {s.name: s.durations for s in stations} == {
+        s.name: s.durations for s in expected
+    }
+    assert {s.name: s.not_found for s in stations} == {
+        "Far": {"D"},
+        "Near": {"C", "D"},
+        "Everywhere": set(),
+    }
+
+
+def test_smaller_max_duration_matches_fresh_run(tmp_path: Path) -> None:
+    path = tmp_path.joinpath("run.npz")
+    _save(path, max_duration=40)
+    _, stations, _ = load_snapshot(path, max_duration=30)
+    expected = unserialize_stations(REACHABLE, max_duration=30)
+    assert {s.name: s.durations for s in stations} == {
+        s.name: s.durations for s in expected
+    }
+    assert next(s for s in stations if s.name == "Far").durations["D"] == 60
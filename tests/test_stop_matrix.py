@@ -0,0 +1,103 @@
+"""Stop matrix against the local stub server"""
+from collections.abc import Iterator
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from berlin_public_transport_reachability.entities import QueryOptions
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.fetch import (
+    fetch_stations_with_matrix,
+    unserialize_stations,
+)
+from berlin_public_transport_reachability.providers import Provider
+from berlin_public_transport_reachability.stop_matrix import (
+    StopMatrix,
+    build_stop_matrix,
+)
+from berlin_public_transport_reachability.stub_server import StubConfig, StubServer
+from berlin_public_transport_reachability.transport_api import BerlinTransportApi
+
+HORIZON = 60
+
+
+@pytest.fixture()
+def options() -> Iterator[QueryOptions]:
+    server = StubServer(("127.0.0.1", 0), StubConfig(count_stations=300)).start()
+    provider = Provider(
+        name="stub",
+        base_url=server.base_url,
+        timezone="Europe/Berlin",
+        requests_per_second=1000,
+    )
+    yield QueryOptions(
+        time=TimeValue.NEXT_WORKDAY_NOON, max_transfers=2, provider=provider
+    )
+    server.stop()
+
+
+@pytest.fixture()
+def stop_matrix(tmp_path: Path, options: QueryOptions) -> StopMatrix:
+    return build_stop_matrix(
+        tmp_path.joinpath("matrix"), ["Seed"], options=options, horizon=HORIZON
+    )
+
+
+def test_find_matches_exact_names_only(stop_matrix: StopMatrix) -> None:
+    names = set(stop_matrix.names)
+    name = next(n for n in names if f"{n}4" in names)  # e.g. 'Stop 17' and 'Stop 174'
+    assert stop_matrix.find(name) == stop_matrix.index_of(name)
+    assert stop_matrix.find(name[:-1] + " ") is None
+    assert stop_matrix.find(name.lower()) is None
+
+
+def test_stations_match_api(stop_matrix: StopMatrix, options: QueryOptions) -> None:
+    stops = stop_matrix.names[5:7]
+    assert all(stop_matrix.find(stop) is not None for stop in stops)
+    # the stub locates a query by a hash of its name, so unknown queries fall back to the api
+    queries = [*stops, "Alexanderplatz"]
+    destinations, stations = fetch_stations_with_matrix(
+        queries,
+        max_duration=40,
+        horizon=HORIZON,
+        options=options,
+        stop_matrix=stop_matrix,
+    )
+    assert [d.name for d in destinations] == queries
+
+    api = BerlinTransportApi(max_duration=HORIZON, options=options)
+    reachable = {
+        stop: api.get_reachable_stops_from(
+            stop_matrix.get_destination(stop_matrix.names.index(stop))
+        )
+        for stop in stops
+    }
+    reachable["Alexanderplatz"] = api.get_reachable_stops_from(destinations[2])
+    expected = unserialize_stations(reachable, max_duration=40)
+    assert {s.name: s.durations for s in stations} == {
+        s.name: s.durations for s in expected
+    }
+    assert {s.name: s.products for s in stations} == {
+        s.name: s.products for s in expected
+    }
+
+
+def test_unusable_matrix_names_the_differing_parameters(
+    stop_matrix: StopMatrix, options: QueryOptions, caplog: pytest.LogCaptureFixture
+) -> None:
+    stop = stop_matrix.names[5]
+    fetch_stations_with_matrix(
+        [stop],
+        max_duration=40,
+        horizon=HORIZON + 30,
+        options=replace(options, max_transfers=1),
+        stop_matrix=stop_matrix,
+    )
+    warnings = [r.getMessage() for r in caplog.records if r.levelname == "WARNING"]
+    assert len(warnings) == 1
+    warning = warnings[0]
+    assert "transfers (matrix: 2, query: 1)" in warning
+    assert f"horizon (matrix: {HORIZON} min, query: {HORIZON + 30} min)" in warning
+    assert "provider" not in warning
+    assert "products" not in warning
@@ -0,0 +1,72 @@
+"""Variant lattice against the local stub server"""
+from typing import TYPE_CHECKING
+
+from berlin_public_transport_reachability.entities import QueryOptions
+from berlin_public_transport_reachability.enums import TimeValue
+from berlin_public_transport_reachability.fetch import (
+    fetch_api_data,
+    unserialize_stations,
+)
+from berlin_public_transport_reachability.providers import Provider
+from berlin_public_transport_reachability.stub_server import StubConfig, StubServer
+from berlin_public_transport_reachability.variants import (
+    NOT_REACHED,
+    FetchOptions,
+    Variant,
+    fetch_variants,
+)
+
+if TYPE_CHECKING:
+    from berlin_public_transport_reachability.station import Station
+
+DESTINATIONS = ["Alexanderplatz", "Mehringdamm"]
+
+
+def test_lattice_matches_unserialize_stations() -> None:
+    server = StubServer(("127.0.0.1", 0), StubConfig(count_stations=1000)).start()
+    try:
+        provider = Provider(
+            name="stub",
+            base_url=server.base_url,
+            timezone="Europe/Berlin",
+            requests_per_second=1000,
+        )
+        query = QueryOptions(
+            time=TimeValue.NEXT_WORKDAY_NOON, max_transfers=3, provider=provider
+        )
+        variants = [Variant.parse("rail_only:0"), Variant.parse("default:3")]
+        # the smaller variant first, so the larger one adds stations to the lattice
+        lattice = fetch_variants(
+            DESTINATIONS,
+            variants[:1],
+            FetchOptions(query=query, horizon=30),
+        )
+        lattice = fetch_variants(
+            DESTINATIONS,
+            variants,
+            FetchOptions(query=query, horizon=30),
+            lattice=lattice,
+        )
+        expected: dict[int, list["Station"]] = {}
+        for variant in variants:
+            options = QueryOptions(
+                time=query.time,
+                max_transfers=variant.max_transfers,
+                provider=provider,
+                products=variant.products,
+            )
+            _, reachable = fetch_api_data(
+                DESTINATIONS, max_duration=30, options=options
+            )
+            expected[variant.key] = unserialize_stations(reachable, max_duration=30)
+    finally:
+        server.stop()
+
+    for variant in variants:
+        matrix = lattice.durations(variant)
+        assert matrix.shape == (len(lattice.stations), len(DESTINATIONS))
+        stations = lattice.get_stations(variant, max_duration=30)
+        assert {s.name: s.durations for s in stations} == {
+            s.name: s.durations for s in expected[variant.key]
+        }
+    assert (lattice.durations(variants[0]) == NOT_REACHED).any()